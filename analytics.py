@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from balance import ADMIN
+
+# Monthly rollup of the ledger: quantity moved and money spent per item,
+# department and month. Receipts are the rows with department 'Admin' (their
+# spend is the receipts' Total Price); the other rows are issues.
+ROLLUP_COLUMNS = ['Item Name', 'Type', 'Department', 'Month', 'Quantity', 'Spend']
+KEYS = ROLLUP_COLUMNS[:4]
+# Rolled-up rows kept apart from the base before they are folded into it, and
+# the number of recent frames that are merged into one
+FOLD_ROWS = 5000
+MAX_RECENT = 16
+
+# Defaults for reorder alerts: months of issues the burn rate is taken over, an
+# item is flagged when Admin stock covers fewer months than cover_months, and
+# the suggested order tops it up to target_months of cover
+BURN_MONTHS = 3
+COVER_MONTHS = 1.0
+TARGET_MONTHS = 3.0
+
+
+def _empty_rollup():
+    return pd.DataFrame({
+        'Item Name': pd.Categorical([]), 'Type': pd.Categorical([]), 'Department': pd.Categorical([]),
+        'Month': pd.Series(dtype='datetime64[ns]'), 'Quantity': pd.Series(dtype='int64'), 'Spend': pd.Series(dtype='float64')
+    })
+
+# Frames stacked, with the categories of the key columns unioned (pd.concat
+# would fall back to slow object columns when they differ)
+def _concat(frames):
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    combined = {
+        col: union_categoricals([frame[col] for frame in frames]) if col in KEYS[:3]
+        else np.concatenate([frame[col].to_numpy() for frame in frames])
+        for col in ROLLUP_COLUMNS
+    }
+    return pd.DataFrame(combined, columns=ROLLUP_COLUMNS)
+
+def _group(frame):
+    return frame.groupby(KEYS, observed=True, sort=False)[['Quantity', 'Spend']].sum().reset_index()[ROLLUP_COLUMNS]
+
+# Ledger rows as rollup rows (one per entry, not yet summed)
+def _rows(ledger_df):
+    month = pd.to_datetime(ledger_df['Date'], errors='coerce', format='mixed').to_numpy().astype('datetime64[M]')
+    quantity = pd.to_numeric(ledger_df['Quantity Issued'], errors='coerce')
+    spend = pd.to_numeric(ledger_df['Total Price'], errors='coerce')
+    return pd.DataFrame({
+        'Item Name': ledger_df['Item Name'].astype('category').array,
+        'Type': ledger_df['Type'].astype('category').array,
+        'Department': ledger_df['Department'].astype('category').array,
+        'Month': month.astype('datetime64[ns]'),
+        'Quantity': np.asarray(quantity.fillna(0), dtype='int64'),
+        'Spend': np.asarray(spend.fillna(0), dtype='float64')
+    }, columns=ROLLUP_COLUMNS)
+
+# Roll ledger rows up by item, department and month in one grouped pass
+def rollup_rows(ledger_df):
+    if ledger_df.empty:
+        return _empty_rollup()
+    return _group(_rows(ledger_df))
+
+# Rollup over the first `size` ledger rows. Like LedgerIndex it is never
+# modified: extended() rolls up only the rows appended since and returns a new
+# rollup. Those land in small recent frames next to the base and are folded
+# into it once there are FOLD_ROWS of them, so an append costs O(new rows).
+# Sums are additive, so queries simply read base and recent frames together.
+class Rollup:
+    def __init__(self, size=0, base=None, recent=()):
+        self.size = size
+        self.base = base if base is not None else _empty_rollup()
+        self.recent = tuple(recent)
+        self._frame = None
+
+    def extended(self, ledger):
+        if len(ledger) <= self.size:
+            return self
+        tail = ledger.iloc[self.size:]
+        # The tail of a typed ledger still carries every item's category, and
+        # grouping it with the other recent rows would cost O(items) however few
+        # rows there are
+        tail = tail.assign(**{
+            col: tail[col].cat.remove_unused_categories() for col in KEYS[:3] if isinstance(tail[col].dtype, pd.CategoricalDtype)
+        })
+        # Recent frames may repeat keys anyway, so a commit's few rows are kept as
+        # they are; they are summed when the recent frames are merged or folded
+        recent = self.recent + (_rows(tail),)
+        if sum(len(frame) for frame in recent) >= FOLD_ROWS:
+            return Rollup(len(ledger), _group(_concat([self.base, *recent])))
+        if len(recent) >= MAX_RECENT:
+            recent = (_group(_concat(recent)),)
+        return Rollup(len(ledger), self.base, recent)
+
+    # Every rolled-up row; the same key may appear in the base and in recent frames
+    def frame(self):
+        if self._frame is None:
+            self._frame = _concat([self.base, *self.recent])
+        return self._frame
+
+
+def _filter(frame, departments=None, types=None, items=None):
+    mask = np.ones(len(frame), dtype=bool)
+    if departments:
+        mask &= frame['Department'].isin(departments).to_numpy()
+    if types:
+        mask &= frame['Type'].isin(types).to_numpy()
+    if items:
+        mask &= frame['Item Name'].isin(items).to_numpy()
+    return frame[mask]
+
+# Quantity issued per month (rows) and department (columns), optionally only
+# for some departments, item types or items. Months without issues are zero.
+def monthly_usage(rollup, departments=None, types=None, items=None):
+    frame = rollup.frame()
+    issues = _filter(frame[frame['Department'] != ADMIN], departments, types, items)
+    if issues.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Month'))
+    usage = issues.groupby(['Month', 'Department'], observed=True)['Quantity'].sum().unstack(fill_value=0)
+    months = pd.date_range(usage.index.min(), usage.index.max(), freq='MS', name='Month')
+    return usage.reindex(months, fill_value=0)
+
+# Receipt spend (Total Price) per month (rows) and item type (columns)
+def monthly_spend(rollup, types=None, items=None):
+    frame = rollup.frame()
+    receipts = _filter(frame[frame['Department'] == ADMIN], None, types, items)
+    if receipts.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Month'))
+    spend = receipts.groupby(['Month', 'Type'], observed=True)['Spend'].sum().unstack(fill_value=0)
+    months = pd.date_range(spend.index.min(), spend.index.max(), freq='MS', name='Month')
+    return spend.reindex(months, fill_value=0)
+
+# Items whose Admin stock will not last: the burn rate is the average monthly
+# quantity issued over the burn_months up to and including `month` (the
+# latest month in the ledger by default). Flags items covering fewer than
+# cover_months, most urgent first, with the order that restores target_months.
+def reorder_alerts(rollup, overview, month=None, burn_months=BURN_MONTHS, cover_months=COVER_MONTHS,
+                   target_months=TARGET_MONTHS, types=None):
+    frame = rollup.frame()
+    issues = frame[frame['Department'] != ADMIN]
+    columns = ['Item Name', 'Type', 'Admin', 'Monthly burn', 'Months of cover', 'Suggested order']
+    if issues.empty:
+        return pd.DataFrame(columns=columns)
+    last = issues['Month'].max() if month is None else pd.Timestamp(month).to_period('M').to_timestamp()
+    first = last - pd.DateOffset(months=burn_months - 1)
+    window = issues[(issues['Month'] >= first) & (issues['Month'] <= last)]
+    burn = window.groupby('Item Name', observed=True)['Quantity'].sum() / burn_months
+
+    stock = overview[['Item Name', 'Type', 'Admin']].copy()
+    if types:
+        stock = stock[stock['Type'].isin(types)]
+    stock['Admin'] = pd.to_numeric(stock['Admin'])
+    stock['Monthly burn'] = stock['Item Name'].map(burn).fillna(0).to_numpy()
+    stock = stock[stock['Monthly burn'] > 0]
+    stock['Months of cover'] = (stock['Admin'] / stock['Monthly burn']).round(1)
+    alerts = stock[stock['Months of cover'] < cover_months].copy()
+    alerts['Monthly burn'] = alerts['Monthly burn'].round(1)
+    alerts['Suggested order'] = np.ceil(alerts['Monthly burn'] * target_months - alerts['Admin']).clip(lower=0).astype(int)
+    return alerts.sort_values(['Months of cover', 'Monthly burn'], ascending=[True, False])[columns].reset_index(drop=True)
@@ -0,0 +1,171 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Overview columns that come before the department columns
+OVERVIEW_BASE_COLUMNS = ['Item Name', 'Type', 'Total', 'Admin']
+ADMIN = 'Admin'
+
+# Empty overview with one column per department
+def empty_overview(departments):
+    return pd.DataFrame(columns=OVERVIEW_BASE_COLUMNS + list(departments))
+
+# Compute the whole overview from the ledger in one grouped pass.
+# Same rules as the old row-by-row replay: receipts into Admin add to Admin,
+# issues to a known department move stock from Admin to that department,
+# anything else is ignored, and items appear in order of first use.
+def compute_overview(ledger_df, departments):
+    departments = list(departments)
+    if ledger_df.empty:
+        return empty_overview(departments)
+
+    names = ledger_df['Item Name']
+    dept = ledger_df['Department']
+    qty = pd.to_numeric(ledger_df['Quantity Issued'], errors='coerce').fillna(0)
+    if isinstance(qty.dtype, pd.api.extensions.ExtensionDtype):
+        qty = qty.astype(qty.dtype.numpy_dtype)
+    received = (dept == ADMIN).to_numpy()
+    issued = (dept.isin(departments).to_numpy() & ~received)
+
+    # Item columns may be categorical in a typed ledger; the overview keeps plain values
+    items = ledger_df.drop_duplicates('Item Name')[['Item Name', 'Type']].astype(object)
+    overview = items.set_index('Item Name')
+    admin_delta = qty.where(received, 0) - qty.where(issued, 0)
+    overview['Admin'] = admin_delta.groupby(names, sort=False, observed=True).sum()
+
+    per_dept = qty[issued].groupby([names[issued], dept[issued]], observed=True).sum().unstack(fill_value=0)
+    per_dept = per_dept.reindex(index=overview.index, columns=departments, fill_value=0)
+    for d in departments:
+        overview[d] = per_dept[d].fillna(0).astype(qty.dtype)
+
+    overview['Total'] = overview['Admin'] + overview[departments].sum(axis=1)
+    return overview.reset_index()[OVERVIEW_BASE_COLUMNS + departments]
+
+# Department columns of an overview, in order
+def overview_departments(overview):
+    return [col for col in overview.columns if col not in OVERVIEW_BASE_COLUMNS]
+
+# An overview keyed by (item, department): one row per non-zero holding, Admin
+# included, in overview order. Items that hold nothing keep their Admin row.
+HOLDING_COLUMNS = ['Item Name', 'Type', 'Department', 'Quantity']
+
+def overview_holdings(overview):
+    columns = [ADMIN] + overview_departments(overview)
+    values = overview[columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy()
+    item_pos, col_pos = np.nonzero(values)
+    admin_pos = np.arange(len(overview))
+    # Every item's Admin row plus its other non-zero holdings, grouped by item in overview order
+    keep = col_pos != 0
+    item_pos = np.concatenate([admin_pos, item_pos[keep]])
+    col_pos = np.concatenate([np.zeros(len(overview), dtype=int), col_pos[keep]])
+    order = np.lexsort((col_pos, item_pos))
+    item_pos, col_pos = item_pos[order], col_pos[order]
+    return pd.DataFrame({
+        'Item Name': overview['Item Name'].to_numpy()[item_pos],
+        'Type': overview['Type'].to_numpy()[item_pos],
+        'Department': np.array(columns, dtype=object)[col_pos],
+        'Quantity': values[item_pos, col_pos]
+    }, columns=HOLDING_COLUMNS)
+
+# Overview with one column per department from its holdings
+def overview_from_holdings(holdings, departments):
+    departments = list(departments)
+    if holdings.empty:
+        return empty_overview(departments)
+    items = holdings.drop_duplicates('Item Name')[['Item Name', 'Type']]
+    quantities = pd.to_numeric(holdings['Quantity'])
+    if (quantities % 1 == 0).all():
+        quantities = quantities.astype('int64')
+    wide = quantities.groupby([holdings['Item Name'], holdings['Department']], sort=False).sum().unstack(fill_value=0)
+    wide = wide.reindex(index=items['Item Name'], columns=[ADMIN] + departments, fill_value=0)
+    overview = items.set_index('Item Name')
+    for col in wide.columns:
+        overview[col] = wide[col]
+    overview['Total'] = overview[[ADMIN] + departments].sum(axis=1)
+    return overview.reset_index()[OVERVIEW_BASE_COLUMNS + departments]
+
+# Hash index over an overview: row position by item name, and the item names
+# of each type in overview order (what the Issue Items dropdown lists)
+ItemIndex = namedtuple('ItemIndex', ['rows', 'by_type'])
+
+def build_index(inventory):
+    rows = {}
+    by_type = {}
+    for pos, (item_name, item_type) in enumerate(zip(inventory['Item Name'], inventory['Type'])):
+        if item_name not in rows:
+            rows[item_name] = pos
+            by_type.setdefault(item_type, []).append(item_name)
+    return ItemIndex(rows, by_type)
+
+# Copy of an index that can be extended without touching the original
+def copy_index(index):
+    return ItemIndex(dict(index.rows), {item_type: list(names) for item_type, names in index.by_type.items()})
+
+# Row position of an item in the overview, or None if it is not there yet
+def find_item(inventory, item_name, index=None):
+    if index is not None:
+        return index.rows.get(item_name)
+    positions = np.flatnonzero(inventory['Item Name'].to_numpy() == item_name)
+    return positions[0] if len(positions) else None
+
+# Admin stock currently held for an item (0 for unknown items)
+def admin_stock(inventory, item_name, index=None):
+    row = find_item(inventory, item_name, index)
+    return 0 if row is None else inventory['Admin'].iat[row]
+
+# Apply a single ledger entry to an existing overview without replaying the ledger.
+# If an index is given it is used for the lookup and updated for new items.
+def apply_entry(inventory, entry, departments, index=None):
+    item_name = entry['Item Name']
+    department = entry['Department']
+    quantity = entry['Quantity Issued']
+
+    row = find_item(inventory, item_name, index)
+    if row is None:
+        new_row = {'Item Name': item_name, 'Type': entry['Type'], 'Total': 0, 'Admin': 0}
+        for dept in departments:
+            new_row[dept] = 0
+        inventory = pd.concat([inventory, pd.DataFrame([new_row])], ignore_index=True)
+        row = len(inventory) - 1
+        if index is not None:
+            index.rows[item_name] = row
+            index.by_type.setdefault(entry['Type'], []).append(item_name)
+    label = inventory.index[row]
+
+    if department == ADMIN:
+        inventory.at[label, 'Admin'] += quantity
+    elif department in departments:
+        if department not in inventory.columns:
+            inventory[department] = 0
+        inventory.at[label, department] += quantity
+        inventory.at[label, 'Admin'] -= quantity
+
+    dept_cols = [d for d in departments if d in inventory.columns]
+    inventory.at[label, 'Total'] = inventory.at[label, 'Admin'] + sum(inventory.loc[label, dept_cols])
+    return inventory
+
+# Add a delta overview (the compute_overview() of a batch of new entries) to an
+# existing overview in one step. Items the overview has not seen yet are
+# appended in the delta's order, just as apply_entry() would for each entry.
+def add_overview(inventory, delta, departments, index=None):
+    if index is None:
+        index = build_index(inventory)
+    value_cols = ['Total', 'Admin'] + [d for d in departments if d in inventory.columns]
+    positions = delta['Item Name'].map(index.rows)
+    known = positions.notna().to_numpy()
+
+    if known.any():
+        rows = positions[known].astype(int).to_numpy()
+        for col in value_cols:
+            values = inventory[col].to_numpy().copy()
+            values[rows] = values[rows] + delta[col].to_numpy()[known]
+            inventory[col] = values
+
+    if not known.all():
+        new_items = delta[~known].reindex(columns=inventory.columns, fill_value=0)
+        start = len(inventory)
+        inventory = pd.concat([inventory, new_items], ignore_index=True)
+        for offset, (item_name, item_type) in enumerate(zip(new_items['Item Name'], new_items['Type'])):
+            index.rows[item_name] = start + offset
+            index.by_type.setdefault(item_type, []).append(item_name)
+    return inventory
@@ -0,0 +1,265 @@
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from balance import admin_stock
+from datastore import DataStore, release_datastore
+from inventory_service import ASSET_TYPES, DEFAULT_DEPARTMENTS, InventoryService
+from schema import LedgerBuffer
+from storage import LEDGER_COLUMNS, open_store
+
+# Vendors the synthetic receipts come from
+VENDORS = ['Sharma Traders', 'City Hardware', 'Kids Stationers', 'Green Thumb Nursery', 'Sportsline', 'Bright Electricals']
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# A result counts as a regression when it is this much slower or larger than
+# the baseline, and by more than the noise floor: fast operations vary by a
+# large fraction of their time from run to run
+DEFAULT_THRESHOLD = 0.2
+NOISE_FLOOR_MS = 1.0
+NOISE_FLOOR_MB = 0.5
+# Times on a busy machine drift by more than the threshold from one moment to
+# the next, so sizes with a regression are measured again this many times
+# before it is reported; a real regression is still there, noise is not
+DEFAULT_RETRIES = 2
+
+
+# Synthetic ledger of the given length, deterministic for a seed. Every item
+# starts with a receipt large enough that Admin stock never goes negative, and
+# 'Current Stock' is the item's running Admin balance, as in a real ledger.
+def generate_ledger(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    item_count = int(min(max(rows // 50, len(ASSET_TYPES)), 20_000))
+    item_types = np.array(ASSET_TYPES, dtype=object)[np.arange(item_count) % len(ASSET_TYPES)]
+    item_names = np.array([f'{t.split()[0]} item {i}' for i, t in enumerate(item_types)], dtype=object)
+
+    items = np.concatenate([np.arange(min(item_count, rows)), rng.integers(0, item_count, max(rows - item_count, 0))])
+    receipt = rng.random(rows) < 0.3
+    receipt[:min(item_count, rows)] = True
+    quantity = np.where(receipt, rng.integers(20, 200, rows), rng.integers(1, 10, rows))
+    department = np.where(receipt, 'Admin', np.array(DEFAULT_DEPARTMENTS, dtype=object)[rng.integers(0, len(DEFAULT_DEPARTMENTS), rows)])
+
+    start = np.datetime64('2019-04-01')
+    days = np.sort(rng.integers(0, 5 * 365, rows))
+    days[:min(item_count, rows)] = 0
+    dates = pd.Series(start + days.astype('timedelta64[D]')).dt.strftime('%Y-%m-%d')
+
+    # Top up each item's opening receipt by its deepest shortfall, if any
+    signed = pd.Series(np.where(receipt, quantity, -quantity))
+    shortfall = (-signed.groupby(items).cumsum().groupby(items).min()).clip(lower=0)
+    first = min(item_count, rows)
+    quantity[:first] += shortfall.reindex(np.arange(first), fill_value=0).to_numpy()
+    signed = pd.Series(np.where(receipt, quantity, -quantity))
+    stock = signed.groupby(items).cumsum().to_numpy()
+    vendors = np.array(VENDORS, dtype=object)[rng.integers(0, len(VENDORS), rows)]
+    return pd.DataFrame({
+        'Date': dates,
+        'Type': item_types[items],
+        'Item Name': item_names[items],
+        'Department': department,
+        'Quantity Issued': quantity,
+        'Current Stock': stock,
+        'Vendor Name': np.where(receipt, vendors, ''),
+        'Invoice Number': np.where(receipt, pd.Series(rng.integers(1000, 99999, rows)).astype(str), ''),
+        'Total Price': np.where(receipt, np.round(quantity * rng.uniform(5, 500, rows), 2), np.nan)
+    }, columns=LEDGER_COLUMNS)
+
+
+# Wall-clock seconds of each of repeat calls, and the peak traced memory of one
+# more call. Memory is measured on its own run because tracing slows the code down.
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'median_ms': statistics.median(times) * 1000, 'min_ms': min(times) * 1000, 'peak_mb': peak / 1e6, 'repeat': repeat}
+
+
+# Time the core operations the app runs on a ledger of the given size. The
+# store lives in a scratch directory and is removed afterwards.
+def run_size(rows, backend, repeat, seed=0):
+    ledger = generate_ledger(rows, seed)
+    departments = list(DEFAULT_DEPARTMENTS)
+    results = {}
+    # Large sizes take seconds per call; a few repeats are enough there
+    slow_repeat = max(1, min(repeat, 3 if rows >= 100_000 else repeat))
+
+    with tempfile.TemporaryDirectory() as directory:
+        base_name = os.path.join(directory, 'Inventory')
+        service = InventoryService(base_name, departments, backend)
+        try:
+            results['save_ledger'] = measure(lambda: service.save_ledger(ledger), slow_repeat)
+            overview = service.overview()
+            results['save_overview'] = measure(lambda: service.save_overview(overview), slow_repeat)
+
+            # Cold start without a checkpoint (parse the whole ledger and build the overview) and
+            # with one (load the ledger and overview saved with it, parse only the entries after it)
+            store = open_store(base_name, backend)
+            results['load_ledger'] = measure(lambda: LedgerBuffer.from_frame(store.read_ledger()).frame(), slow_repeat)
+            results['load_overview'] = measure(
+                lambda: DataStore(open_store(base_name, backend), departments).snapshot(), slow_repeat
+            )
+            service.data.checkpoint()
+            results['load_overview_checkpoint'] = measure(
+                lambda: DataStore(open_store(base_name, backend), departments).snapshot(), slow_repeat
+            )
+
+            results['update_inventory'] = measure(service.rebuild_overview, slow_repeat)
+
+            # Issue Items: the dropdown for a type, then the Admin balance of the chosen item
+            snapshot = service.snapshot()
+            picks = [(t, snapshot.index.by_type.get(t, [''])[0]) for t in ASSET_TYPES]
+
+            def issue_lookup():
+                for item_type, _ in picks:
+                    snapshot.index.by_type.get(item_type, [])
+                for _, item_name in picks:
+                    admin_stock(snapshot.overview, item_name, snapshot.index)
+
+            results['issue_lookup'] = measure(issue_lookup, repeat * 10)
+
+            # Type-ahead: a few keystrokes' worth of item searches, catalogue already built
+            catalogue = service.catalogue(snapshot)
+            queries = [item_name[:n] for _, item_name in picks for n in (2, 5)] + ['hardwre item 1']
+            results['item_search'] = measure(lambda: [catalogue.search(q) for q in queries], repeat * 10)
+
+            item_type, item_name = picks[0]
+            results['add_transaction_receipt'] = measure(
+                lambda: service.add_transaction('2024-06-01', item_type, item_name, 'Admin', 5, VENDORS[0], '1', 50.0),
+                repeat
+            )
+            results['add_transaction_issue'] = measure(
+                lambda: service.add_transaction('2024-06-01', item_type, item_name, departments[0], 1), repeat
+            )
+        finally:
+            release_datastore(base_name, backend)
+    return results
+
+
+def run(sizes, backend, repeat):
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'backend': backend,
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'results': {}
+    }
+    for rows in sizes:
+        print(f"Benchmarking {rows:,} rows...", file=sys.stderr)
+        report['results'][str(rows)] = run_size(rows, backend, repeat)
+    return report
+
+
+def format_report(report):
+    lines = [f"backend={report['backend']} python={report['python']} pandas={report['pandas']}"]
+    lines.append(f"{'rows':>10}  {'operation':<26} {'median ms':>11} {'min ms':>11} {'peak MB':>9}")
+    for rows, results in report['results'].items():
+        for name, result in results.items():
+            lines.append(
+                f"{int(rows):>10,}  {name:<26} {result['median_ms']:>11.3f} {result['min_ms']:>11.3f} {result['peak_mb']:>9.2f}"
+            )
+    return '\n'.join(lines)
+
+
+# Keep the fastest time and smallest peak memory of each operation over two runs of the same sizes
+def merge_fastest(report, rerun):
+    for rows, results in rerun['results'].items():
+        for name, result in results.items():
+            kept = report['results'][rows][name]
+            kept['min_ms'] = min(kept['min_ms'], result['min_ms'])
+            kept['peak_mb'] = min(kept['peak_mb'], result['peak_mb'])
+    return report
+
+
+# Compare a run with a baseline run. Times are the fastest of each run's calls,
+# which scheduling and cache noise can only slow down, not the median of a few
+# calls. Returns the report lines and the (rows, operation) pairs whose time or
+# peak memory grew by more than threshold and by more than the noise floor.
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD, floor_ms=NOISE_FLOOR_MS, floor_mb=NOISE_FLOOR_MB):
+    lines = [f"{'rows':>10}  {'operation':<26} {'min ms before':>13} {'min ms after':>13} {'change':>8} {'MB change':>10}"]
+    regressions = []
+    for rows, results in report['results'].items():
+        before = baseline['results'].get(rows, {})
+        for name, result in results.items():
+            if name not in before:
+                continue
+            ms_before, ms_after = before[name]['min_ms'], result['min_ms']
+            mb_before, mb_after = before[name]['peak_mb'], result['peak_mb']
+            time_change = ms_after / ms_before - 1 if ms_before else 0
+            memory_change = mb_after / mb_before - 1 if mb_before else 0
+            slower = time_change > threshold and ms_after - ms_before > floor_ms
+            larger = memory_change > threshold and mb_after - mb_before > floor_mb
+            flag = ''
+            if slower or larger:
+                regressions.append((rows, name))
+                flag = '  REGRESSION'
+            lines.append(
+                f"{int(rows):>10,}  {name:<26} {ms_before:>13.3f} {ms_after:>13.3f} "
+                f"{time_change:>+8.0%} {memory_change:>+10.0%}{flag}"
+            )
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the inventory's core operations on synthetic ledgers.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="ledger sizes in rows (default: %(default)s)")
+    parser.add_argument('--backend', default='journal', help="storage backend: journal, sqlite or excel")
+    parser.add_argument('--repeat', type=int, default=5, help="timed calls per operation (default: %(default)s)")
+    parser.add_argument('--save', metavar='FILE', help="write the results to a JSON file")
+    parser.add_argument('--compare', metavar='FILE', help="compare with the results saved by an earlier run")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown or memory growth that counts as a regression (default: %(default)s)")
+    parser.add_argument('--noise-floor-ms', type=float, default=NOISE_FLOOR_MS,
+                        help="slowdowns of at most this many ms are never regressions (default: %(default)s)")
+    parser.add_argument('--noise-floor-mb', type=float, default=NOISE_FLOOR_MB,
+                        help="memory growth of at most this many MB is never a regression (default: %(default)s)")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help="times sizes with a regression are measured again before it counts (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.backend, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        floors = (args.threshold, args.noise_floor_ms, args.noise_floor_mb)
+        for _ in range(args.retries):
+            regressions = compare(report, baseline, *floors)[1]
+            if not regressions:
+                break
+            print(f"Measuring {len(regressions)} regression(s) again...", file=sys.stderr)
+            sizes = sorted({int(rows) for rows, _ in regressions})
+            report = merge_fastest(report, run(sizes, args.backend, args.repeat))
+    print(format_report(report))
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if baseline is not None:
+        lines, regressions = compare(report, baseline, *floors)
+        print()
+        print('\n'.join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%} (and {args.noise_floor_ms:g} ms or {args.noise_floor_mb:g} MB)")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import pandas as pd
+from balance import ADMIN
+
+# Columns a batch file must have. Department is required for issues only;
+# the others are optional and default to blank.
+REQUIRED_COLUMNS = ['Date', 'Type', 'Item Name', 'Quantity']
+OPTIONAL_COLUMNS = ['Department', 'Vendor Name', 'Invoice Number', 'Total Price']
+ERROR_COLUMNS = ['Row', 'Problem']
+
+# Read an uploaded CSV or Excel batch into a frame of stripped strings
+def read_batch(file, file_name):
+    if file_name.lower().endswith('.csv'):
+        batch = pd.read_csv(file, dtype=str)
+    else:
+        batch = pd.read_excel(file, dtype=str, engine='openpyxl')
+    batch = batch.rename(columns=lambda col: str(col).strip())
+    if 'Quantity' not in batch.columns and 'Quantity Issued' in batch.columns:
+        batch = batch.rename(columns={'Quantity Issued': 'Quantity'})
+    missing = [col for col in REQUIRED_COLUMNS if col not in batch.columns]
+    if missing:
+        raise ValueError(f"The file is missing these columns: {', '.join(missing)}")
+    if batch.empty:
+        raise ValueError("The file has no rows to import")
+    batch = batch.reindex(columns=REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+    return batch.fillna('').astype(str).apply(lambda col: col.str.strip()).reset_index(drop=True)
+
+# Check every row of a batch in one vectorized pass. Issues are checked against
+# a running Admin balance per item that starts from the current overview and
+# includes the earlier rows of the batch. Returns the ledger entries and a frame
+# of problems (spreadsheet row number and message); only commit if it is empty.
+def validate_batch(batch, overview, index, departments, receipts, item_types=None):
+    problems = []
+
+    def flag(mask, message):
+        if mask.any():
+            # A message Series may hold only the flagged rows
+            messages = message.loc[batch.index[mask]] if isinstance(message, pd.Series) else message
+            problems.append(pd.DataFrame({'Row': batch.index[mask] + 2, 'Problem': messages}))
+
+    dates = pd.to_datetime(batch['Date'], errors='coerce', format='mixed')
+    flag(dates.isna(), 'Date is missing or not a date')
+    flag(batch['Item Name'] == '', 'Item Name is missing')
+    flag(batch['Type'] == '', 'Type is missing')
+    if item_types is not None:
+        flag((batch['Type'] != '') & ~batch['Type'].isin(item_types), "Unknown Type '" + batch['Type'] + "'")
+
+    recorded_type = batch['Item Name'].map(dict(zip(overview['Item Name'], overview['Type'])))
+    flag(recorded_type.notna() & (recorded_type != batch['Type']), 'Item is recorded as type ' + recorded_type.astype(str))
+
+    quantity = pd.to_numeric(batch['Quantity'], errors='coerce')
+    bad_quantity = quantity.isna() | (quantity <= 0) | (quantity % 1 != 0)
+    flag(bad_quantity, 'Quantity must be a whole number above zero')
+    quantity = quantity.where(~bad_quantity, 0).astype(int)
+
+    if receipts:
+        department = pd.Series(ADMIN, index=batch.index)
+        total_price = pd.to_numeric(batch['Total Price'].replace('', '0'), errors='coerce')
+        flag(total_price.isna(), 'Total Price is not a number')
+        total_price = total_price.round(2)
+    else:
+        department = batch['Department']
+        flag(~department.isin(departments), "Unknown department '" + department + "'")
+        total_price = pd.Series(None, index=batch.index, dtype=object)
+
+    # Running Admin balance per item, starting from the committed stock
+    positions = batch['Item Name'].map(index.rows)
+    admin = pd.to_numeric(overview['Admin']).to_numpy()
+    known = positions.notna()
+    start = pd.Series(0, index=batch.index, dtype=admin.dtype)
+    start[known] = admin[positions[known].astype(int).to_numpy()]
+    signed = quantity.where(department == ADMIN, -quantity)
+    running = start + signed.groupby(batch['Item Name']).cumsum()
+    short = (signed < 0) & (running < 0)
+    available = (running + quantity)[short]
+    flag(short, 'Not enough ' + batch['Item Name'][short] + '. Available: ' + available.astype(int).astype(str))
+
+    errors = pd.concat(problems, ignore_index=True).sort_values('Row', kind='stable') if problems else pd.DataFrame(columns=ERROR_COLUMNS)
+    entries = pd.DataFrame({
+        'Date': dates.dt.strftime("%Y-%m-%d"),
+        'Type': batch['Type'],
+        'Item Name': batch['Item Name'],
+        'Department': department,
+        'Quantity Issued': quantity,
+        'Current Stock': running.astype(int),
+        'Vendor Name': batch['Vendor Name'],
+        'Invoice Number': batch['Invoice Number'],
+        'Total Price': total_price
+    }).to_dict('records')
+    return entries, errors.reset_index(drop=True)
@@ -0,0 +1,161 @@
+import re
+import numpy as np
+
+_SPACES = re.compile(r'\s+')
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_NO_IDS = np.empty(0, dtype=np.int64)
+# Trigram similarity (shared over combined trigrams) a fuzzy match needs
+MIN_SIMILARITY = 0.3
+
+
+# An item name as it is stored: trimmed, with single spaces
+def clean_name(name):
+    return _SPACES.sub(' ', str(name)).strip()
+
+def _singular(word):
+    if len(word) > 3 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith(('ches', 'shes', 'sses', 'xes', 'zes')):
+        return word[:-2]
+    if len(word) > 2 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+# Key that spellings of one item share: case, spacing and punctuation ignored
+# and every word made singular, so 'Mop', 'mop ' and 'Mops' are all 'mop'
+def item_key(name):
+    words = _PUNCTUATION.sub(' ', str(name).casefold()).split()
+    return ' '.join(_singular(word) for word in words)
+
+def _trigrams(key):
+    padded = f' {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Search structure over the item names in the overview: each item's key, the
+# key's word-start suffixes in sorted order for prefix search (so 'mop' finds
+# 'Wet mop' as well as 'Mop bucket'), and trigram postings for misspellings.
+# Instances are never modified; extended() returns a new catalogue that shares
+# what did not change.
+class ItemCatalogue:
+    def __init__(self, names=(), types=(), ids=None, by_key=None, suffixes=None, suffix_ids=None, suffix_starts=None,
+                 postings=None, gram_counts=None):
+        self.names = list(names)
+        self.types = np.array(types, dtype=object)
+        # Position of each stored name, and of the first name with each key
+        self.ids = ids if ids is not None else {name: item_id for item_id, name in enumerate(self.names)}
+        self.by_key = by_key if by_key is not None else {}
+        self.suffixes = suffixes if suffixes is not None else np.empty(0, dtype=object)
+        self.suffix_ids = suffix_ids if suffix_ids is not None else _NO_IDS
+        self.suffix_starts = suffix_starts if suffix_starts is not None else _NO_IDS
+        self.postings = postings if postings is not None else {}
+        self.gram_counts = gram_counts if gram_counts is not None else _NO_IDS
+
+    @classmethod
+    def from_overview(cls, overview):
+        return cls().extended(overview['Item Name'], overview['Type'])
+
+    def __len__(self):
+        return len(self.names)
+
+    # Catalogue with the given items added; names already in it are skipped
+    def extended(self, names, types):
+        # Most commits only name items already here; those cost no dict copies
+        added = [(name, item_type) for name, item_type in zip(names, types) if name not in self.ids]
+        if not added:
+            return self
+        ids = dict(self.ids)
+        by_key = dict(self.by_key)
+        new_names, new_types = [], []
+        suffixes, suffix_ids, suffix_starts, grams, counts = [], [], [], {}, []
+        for name, item_type in added:
+            if name in ids:
+                continue
+            item_id = ids[name] = len(ids)
+            new_names.append(name)
+            new_types.append(item_type)
+            key = item_key(name)
+            by_key.setdefault(key, item_id)
+            words = key.split(' ')
+            for start in range(len(words)):
+                suffixes.append(' '.join(words[start:]))
+                suffix_ids.append(item_id)
+                suffix_starts.append(start)
+            item_grams = _trigrams(key)
+            counts.append(len(item_grams))
+            for gram in item_grams:
+                grams.setdefault(gram, []).append(item_id)
+
+        # Merge the new suffixes into the sorted ones
+        suffixes = np.array(suffixes, dtype=object)
+        order = np.argsort(suffixes, kind='stable')
+        at = np.searchsorted(self.suffixes, suffixes[order], side='right')
+        postings = dict(self.postings)
+        for gram, gram_ids in grams.items():
+            gram_ids = np.array(gram_ids, dtype=np.int64)
+            old = postings.get(gram)
+            postings[gram] = gram_ids if old is None else np.concatenate([old, gram_ids])
+        return ItemCatalogue(
+            self.names + new_names, list(self.types) + new_types, ids, by_key, np.insert(self.suffixes, at, suffixes[order]),
+            np.insert(self.suffix_ids, at, np.array(suffix_ids, dtype=np.int64)[order]),
+            np.insert(self.suffix_starts, at, np.array(suffix_starts, dtype=np.int64)[order]),
+            postings, np.concatenate([self.gram_counts, np.array(counts, dtype=np.int64)])
+        )
+
+    # The stored name that a spelling of an item refers to, or None for a new
+    # item. A stored name is always itself, even if an older duplicate of it
+    # (from before entries were deduplicated) shares its key.
+    def match(self, name):
+        name = clean_name(name)
+        item_id = self.ids.get(name)
+        if item_id is None:
+            item_id = self.by_key.get(item_key(name))
+        return None if item_id is None else self.names[item_id]
+
+    # Name to record for a typed item name: the stored item it spells, else the cleaned name
+    def canonical(self, name):
+        return self.match(name) or clean_name(name)
+
+    # Type of the item a spelling refers to, or None for a new item
+    def item_type(self, name):
+        name = self.match(name)
+        return None if name is None else self.types[self.ids[name]]
+
+    def _fuzzy(self, key):
+        query_grams = _trigrams(key)
+        lists = [self.postings[gram] for gram in query_grams if gram in self.postings]
+        if not lists:
+            return _NO_IDS
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.names))
+        similarity = shared / (len(query_grams) + self.gram_counts - shared)
+        candidates = np.flatnonzero(similarity >= MIN_SIMILARITY)
+        return candidates[np.argsort(-similarity[candidates], kind='stable')]
+
+    # Up to limit item names matching a typed query, best first: the item it
+    # spells, names starting with it, names with a later word starting with it,
+    # then names sharing most of its trigrams (misspellings)
+    def search(self, query, limit=10, item_type=None):
+        key = item_key(query)
+        if not key or not self.names:
+            return []
+        lo = np.searchsorted(self.suffixes, key, side='left')
+        hi = np.searchsorted(self.suffixes, key + '\uffff', side='left')
+        ids, starts = self.suffix_ids[lo:hi], self.suffix_starts[lo:hi]
+        exact = self.by_key.get(key)
+        tiers = [
+            lambda: np.array([] if exact is None else [exact], dtype=np.int64),
+            lambda: ids[starts == 0],
+            lambda: ids[starts > 0],
+            lambda: self._fuzzy(key) if len(key) >= 3 else _NO_IDS
+        ]
+        found = {}
+        for tier in tiers:
+            tier_ids = tier()
+            if item_type is not None:
+                tier_ids = tier_ids[self.types[tier_ids] == item_type]
+            # An item is in a tier at most once per word of its name
+            for item_id in tier_ids[:limit * 8].tolist():
+                found.setdefault(item_id, None)
+                if len(found) == limit:
+                    return [self.names[item_id] for item_id in found]
+        return [self.names[item_id] for item_id in found]
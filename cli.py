@@ -0,0 +1,205 @@
+import argparse
+import sys
+from datetime import date
+from inventory_service import STORE_NAME, STREAM_CHUNK_SIZE, InventoryService
+
+# Command-line entry point for jobs that do not need the Streamlit app, e.g.
+#   python cli.py rebuild --check
+#   python cli.py import receipts receipts.csv
+#   python cli.py export month-end.xlsx --start 2024-03-01 --end 2024-03-31
+#   python cli.py stock --department Sports --type Hardware
+#   python cli.py --store North transfer South "Floor mop" 5
+#   python cli.py stock --all-stores
+
+
+# Per-item stock values that differ between two overviews, one row per item and column
+def overview_differences(current, rebuilt):
+    import pandas as pd
+    columns = [col for col in rebuilt.columns if col not in ('Item Name', 'Type')]
+    before = current.set_index('Item Name').reindex(columns=columns)
+    after = rebuilt.set_index('Item Name').reindex(columns=columns)
+    items = before.index.union(after.index, sort=False)
+    before = before.reindex(items).apply(pd.to_numeric, errors='coerce').fillna(0)
+    after = after.reindex(items).apply(pd.to_numeric, errors='coerce').fillna(0)
+    changed = (before != after).stack()
+    changed = changed[changed]
+    return pd.DataFrame({
+        'Item Name': changed.index.get_level_values(0),
+        'Column': changed.index.get_level_values(1),
+        'Current': [before.at[item, col] for item, col in changed.index],
+        'From ledger': [after.at[item, col] for item, col in changed.index]
+    })
+
+
+# Recompute the overview from the ledger, report where it differs from the
+# current one and, unless --check, store it and take a checkpoint
+def rebuild(service, args):
+    current = service.overview()
+    rebuilt, rows = service.stream_overview(chunk_size=args.chunk_size)
+    differences = overview_differences(current, rebuilt)
+    if len(differences):
+        print(differences.to_string(index=False))
+    if args.check:
+        print(f"{len(differences)} difference(s) between the overview and {rows} ledger entries", file=sys.stderr)
+        return 1 if len(differences) else 0
+    if len(service.ledger()) != rows:
+        print("The ledger changed during the rebuild; nothing was saved. Run it again.", file=sys.stderr)
+        return 1
+    service.save_overview(rebuilt)
+    service.data.checkpoint()
+    print(f"Rebuilt the overview of {len(rebuilt)} items from {rows} ledger entries", file=sys.stderr)
+    return 0
+
+
+# Check a CSV/Excel batch and commit it as one transaction if every row is valid
+def import_file(service, args):
+    from datastore import ConflictError, DepartmentError, StockError
+    with open(args.file, 'rb') as f:
+        entries, errors = service.check_batch(f, args.file, args.kind == 'receipts')
+    if len(errors):
+        print(errors.to_string(index=False), file=sys.stderr)
+        print(f"Found {len(errors)} problem(s). Nothing was imported.", file=sys.stderr)
+        return 1
+    if args.dry_run:
+        print(f"{len(entries)} rows are valid; nothing was imported (dry run)", file=sys.stderr)
+        return 0
+    try:
+        service.commit(entries)
+    except (StockError, ConflictError, DepartmentError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(f"Imported {len(entries)} rows from {args.file}", file=sys.stderr)
+    return 0
+
+
+# Write the workbook, optionally only some dates, departments and item types
+def export(service, args):
+    if not service.has_data():
+        print("There is no inventory data to export yet", file=sys.stderr)
+        return 1
+    unknown = [d for d in args.department if d != 'Admin' and d not in service.snapshot().all_departments]
+    if unknown:
+        print(f"Unknown department(s): {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    args.file = args.file or service.file_name
+    service.export_workbook(args.file, start=args.start, end=args.end, departments=args.department, types=args.type)
+    print(f"Exported the ledger and overview to {args.file}", file=sys.stderr)
+    return 0
+
+
+# Print the overview, optionally only the given item types and the items held
+# by the given departments, or every store's stock of each item
+def stock(service, args):
+    if args.all_stores:
+        if args.department:
+            print("--department cannot be combined with --all-stores", file=sys.stderr)
+            return 1
+        from stores import combined_overview
+        return print_frame(combined_overview(types=args.type, backend=args.backend), args.csv)
+    snapshot = service.snapshot()
+    unknown = [d for d in args.department if d not in snapshot.all_departments]
+    if unknown:
+        print(f"Unknown department(s): {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    overview = snapshot.overview
+    if args.type:
+        overview = overview[overview['Type'].isin(args.type)]
+    if args.department:
+        overview = overview[(overview[args.department] > 0).any(axis=1)]
+        overview = overview[['Item Name', 'Type'] + args.department]
+    return print_frame(overview, args.csv)
+
+def print_frame(frame, csv):
+    if csv:
+        frame.to_csv(sys.stdout, index=False)
+    else:
+        print(frame.to_string(index=False))
+    return 0
+
+
+# Move Admin stock of an item from --store to another store
+def transfer(service, args):
+    from datastore import StockError
+    from stores import transfer as transfer_stock
+    try:
+        reference = transfer_stock(service.store_name, args.destination, args.date.isoformat(), args.item, args.quantity, args.backend)
+    except StockError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(f"Transferred {args.quantity} {args.item} from {service.store_name} to {args.destination} ({reference})", file=sys.stderr)
+    return 0
+
+
+# List the registered stores, optionally adding one, and report transfers
+# missing their receipt at the destination; --complete records those receipts
+def stores(service, args):
+    from stores import add_store, complete_transfers, incomplete_transfers, store_names
+    if args.add:
+        add_store(args.add)
+    print('\n'.join(store_names()))
+    if args.complete:
+        print(f"Completed {complete_transfers(args.backend)} transfer(s)", file=sys.stderr)
+        return 0
+    missing = incomplete_transfers(args.backend)
+    if len(missing):
+        print(missing[['Store', 'Date', 'Item Name', 'Quantity Issued', 'Vendor Name', 'Invoice Number']].to_string(index=False), file=sys.stderr)
+        print(f"{len(missing)} incomplete transfer(s); run with --complete to record them", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="School inventory jobs without the web app.")
+    parser.add_argument('--store', default=STORE_NAME, help="store name or path (default: %(default)s)")
+    parser.add_argument('--backend', help="storage backend: journal, sqlite or excel (default: INVENTORY_STORE or journal)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('rebuild', help="recompute the overview from the ledger")
+    command.add_argument('--check', action='store_true', help="only report differences; exit 1 if there are any")
+    command.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE, help="ledger entries read at a time")
+    command.set_defaults(run=rebuild)
+
+    command = commands.add_parser('import', help="import a CSV or Excel batch of receipts or issues")
+    command.add_argument('kind', choices=['receipts', 'issues'])
+    command.add_argument('file')
+    command.add_argument('--dry-run', action='store_true', help="check the file without importing it")
+    command.set_defaults(run=import_file)
+
+    command = commands.add_parser('export', help="write the Ledger and Overview workbook")
+    command.add_argument('file', nargs='?', help="workbook to write (default: the store name with .xlsx)")
+    command.add_argument('--start', type=date.fromisoformat, help="first ledger date to include (YYYY-MM-DD)")
+    command.add_argument('--end', type=date.fromisoformat, help="last ledger date to include; the overview is the stock as of this date")
+    command.add_argument('--department', action='append', default=[], help="repeat for several; 'Admin' for receipts")
+    command.add_argument('--type', action='append', default=[], help="repeat for several item types")
+    command.set_defaults(run=export)
+
+    command = commands.add_parser('stock', help="print stock, optionally for departments or item types")
+    command.add_argument('--department', action='append', default=[], help="repeat for several departments")
+    command.add_argument('--type', action='append', default=[], help="repeat for several item types")
+    command.add_argument('--csv', action='store_true', help="print CSV instead of a table")
+    command.add_argument('--all-stores', action='store_true', help="every registered store's stock, a column per store")
+    command.set_defaults(run=stock)
+
+    command = commands.add_parser('transfer', help="move Admin stock of an item from --store to another store")
+    command.add_argument('destination')
+    command.add_argument('item')
+    command.add_argument('quantity', type=int)
+    command.add_argument('--date', type=date.fromisoformat, default=date.today(), help="transfer date (YYYY-MM-DD, default: today)")
+    command.set_defaults(run=transfer)
+
+    command = commands.add_parser('stores', help="list the stores and check that every transfer was received")
+    command.add_argument('--add', metavar='NAME', help="register a new store")
+    command.add_argument('--complete', action='store_true', help="record the missing receipts of incomplete transfers")
+    command.set_defaults(run=stores)
+
+    args = parser.parse_args(argv)
+    service = InventoryService(args.store, backend=args.backend)
+    try:
+        return args.run(service, args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
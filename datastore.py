@@ -0,0 +1,622 @@
+import atexit
+import threading
+import time
+from collections import namedtuple
+import pandas as pd
+from analytics import Rollup
+from balance import (
+    ADMIN, OVERVIEW_BASE_COLUMNS, add_overview, admin_stock, apply_entry, build_index, compute_overview, copy_index,
+    empty_overview, overview_departments
+)
+from catalogue import ItemCatalogue
+from ledger_index import LedgerIndex
+from metrics import timed
+from schema import LedgerBuffer
+from storage import DEPARTMENT_COLUMNS, CheckpointStore, WriteAheadLog, ledger_fingerprint, open_store
+
+# Ledger entries appended between automatic overview checkpoints
+CHECKPOINT_INTERVAL = 5000
+# Seconds the background writer waits after a commit so that a burst of
+# commits goes to the store as one write, and waits before retrying a failed write
+FLUSH_DELAY = 0.2
+RETRY_DELAY = 5.0
+
+# What sessions are handed. The frames and the item index are shared between
+# sessions and must not be modified in place; every write publishes a new
+# snapshot instead. departments are the active departments, the ones stock can
+# be issued to; archived departments keep their overview column, so the stock
+# they still hold stays counted.
+class Snapshot(namedtuple('Snapshot', ['version', 'ledger', 'overview', 'departments', 'index', 'archived'])):
+    # Every department with an overview column, archived ones included, in the order they were added
+    @property
+    def all_departments(self):
+        return overview_departments(self.overview)
+
+
+# Raised when an issue asks for more than Admin holds in the committed data
+class StockError(ValueError):
+    def __init__(self, item_name, available):
+        super().__init__(f"Not enough {item_name} in inventory to issue. Available: {available}")
+        self.item_name = item_name
+        self.available = available
+
+
+# State of the background writes: entries and commits not yet in the store,
+# seconds since the oldest of them was committed, and the last write error
+# (None once a write succeeds). write_behind is False in a process that writes
+# synchronously because another process owns the write-ahead log.
+WriteStatus = namedtuple('WriteStatus', ['write_behind', 'pending_entries', 'pending_commits', 'oldest_seconds', 'error'])
+
+
+# Raised for an entry or request naming an unknown, archived or duplicate department
+class DepartmentError(ValueError):
+    pass
+
+
+# Whether a name can be a department: not blank, and not one of the overview's own columns
+def _is_department_name(name):
+    return bool(str(name).strip()) and name not in OVERVIEW_BASE_COLUMNS
+
+
+# Raised when an item was changed by someone else after the caller read it
+class ConflictError(RuntimeError):
+    def __init__(self, item_names):
+        names = ', '.join(item_names)
+        super().__init__(f"{names} changed while you were editing. Check the current stock and submit again.")
+        self.item_names = item_names
+
+
+# Process-wide view of one store. The store is parsed once and the result is
+# shared by every Streamlit session; it is re-read only when the files change
+# on disk behind our back. Writes made through here update the cached frames
+# directly, so other sessions see them without a re-parse.
+#
+# Commits are write-behind: an entry is fsynced to the write-ahead log (see
+# storage.py) and published in memory, and a background thread appends the
+# commits made in the meantime to the store in one write. On load, logged
+# commits missing from the store are replayed. Only one process can own a
+# store's log; any other process writes its commits to the store directly.
+class DataStore:
+    def __init__(self, store, default_departments):
+        self.store = store
+        self.default_departments = list(default_departments)
+        self._lock = threading.RLock()
+        self._buffer = None
+        self._snapshot = None
+        self._stamp = None
+        # Department register: name -> archived, in the order departments were added
+        self._departments = None
+        self._version = 0
+        # Version at the last full (re)load, and the last version each item was written at
+        self._base_version = 0
+        self._item_versions = {}
+        # Filter index for the ledger, built on first use and extended after appends
+        self._ledger_index = None
+        # Monthly rollup (see analytics.py), built on first use and then kept
+        # current by every commit
+        self._rollup = None
+        # Item search catalogue (see catalogue.py), built on first use and
+        # extended with the items commits add
+        self._catalogue = None
+        self.checkpoints = CheckpointStore(store.base_name)
+        self._checkpoint_position = 0
+        # Write-behind state: whether this process owns the log (decided on first
+        # load), logged (position, entries) commits not yet in the store, with the
+        # time each was committed, and how many of them the writer is storing now
+        self.wal = WriteAheadLog(store.base_name)
+        self._write_behind = None
+        self._pending = []
+        self._pending_since = []
+        self._in_flight = 0
+        self._write_error = None
+        # Set when the store changed elsewhere before one of our own writes moved the stamp
+        self._changed_elsewhere = False
+        self._written = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._writer = None
+        self._closing = threading.Event()
+
+    def _publish(self, ledger, overview, index=None, reset=False):
+        self._version += 1
+        if index is None:
+            index = build_index(overview)
+        active = [name for name, archived in self._departments.items() if not archived]
+        archived = [name for name, archived in self._departments.items() if archived]
+        self._snapshot = Snapshot(self._version, ledger, overview, active, index, archived)
+        # With commits still to be written the store has not changed on our
+        # account; keeping the stamp lets the writer notice changes from elsewhere
+        if reset or not self._pending:
+            self._stamp = self.store.stamp()
+        if reset:
+            self._base_version = self._version
+            self._item_versions = {}
+            self._ledger_index = None
+            self._rollup = None
+            self._catalogue = None
+
+    def _read_register(self):
+        stored = self.store.read_departments()
+        if stored is None:
+            return None
+        # Older code let blank names and overview column names in; they are dropped
+        return {
+            name: bool(archived) for name, archived in zip(stored['Department'], stored['Archived'])
+            if _is_department_name(name)
+        }
+
+    def _write_register(self, register):
+        self._own_write(self.store.write_departments, pd.DataFrame(list(register.items()), columns=DEPARTMENT_COLUMNS))
+        self._departments = register
+
+    # Write the register or overview to the store. While commits are pending
+    # _publish keeps the stamp, so it is moved past this write here, or the
+    # writer would take our own write for a change from elsewhere and reload;
+    # a change from elsewhere seen just before is remembered for the writer.
+    def _own_write(self, write, data):
+        self._wait_for_writer()
+        if self._pending and self.store.stamp() != self._stamp:
+            self._changed_elsewhere = True
+        write(data)
+        if self._pending:
+            self._stamp = self.store.stamp()
+
+    # Every registered department, archived ones included, read without loading the ledger
+    def stored_departments(self):
+        register = self._read_register()
+        if register is not None:
+            return list(register)
+        stored = self.store.read_overview()
+        return (overview_departments(stored) if stored is not None else []) or list(self.default_departments)
+
+    # Register departments the ledger has entries for but the register lacks, as
+    # archived. Stores from before the register only knew their departments from
+    # the overview columns, and a removed department's column was dropped with
+    # its stock; this brings that stock back. Returns True if any were added.
+    def _register_ledger_departments(self, register, ledger):
+        found = [name for name in ledger['Department'].cat.categories if _is_department_name(name) and name not in register]
+        register.update(dict.fromkeys(found, True))
+        return bool(found)
+
+    @timed('load', rows=lambda result, self: len(self._snapshot.ledger))
+    def _load(self):
+        if self._write_behind is None:
+            self._write_behind = self.wal.acquire()
+        self._buffer = self._read_buffer()
+        if self._write_behind:
+            self._replay(self._buffer.frame())
+        ledger = self._buffer.frame()
+        register = self._read_register()
+        created = register is None
+        if created:
+            register = {name: False for name in self.stored_departments()}
+        if self._register_ledger_departments(register, ledger) or created:
+            # Checkpoints taken under the old department list may have ignored entries
+            self.checkpoints.clear()
+            self._write_register(register)
+        self._departments = register
+        departments = list(register)
+        self._publish(ledger, self._overview_from_checkpoint(ledger, departments), reset=True)
+
+    # The stored ledger. The ledger saved with the latest checkpoint is used if
+    # the store still holds it (its last entry is the store's entry there);
+    # then only the entries after it are read and parsed.
+    def _read_buffer(self):
+        arrays = self.checkpoints.read_ledger()
+        if arrays is not None and len(arrays['dates']):
+            saved = LedgerBuffer.from_arrays(arrays)
+            tail = self.store.read_ledger_from(saved.size - 1)
+            if tail is not None and len(tail):
+                boundary = LedgerBuffer.from_frame(tail.iloc[:1]).frame()
+                if ledger_fingerprint(boundary, 1) == ledger_fingerprint(saved.frame(), saved.size):
+                    saved.append_frame(tail.iloc[1:])
+                    return saved
+        return LedgerBuffer.from_frame(self.store.read_ledger())
+
+    # Queue the logged commits that did not reach the store before the last
+    # process stopped. The writer stores commits in order, so each commit is
+    # looked for after the previous one, at or after the position it was
+    # committed at (other processes may have appended before it was written).
+    # A journal write cut short stores only the first entries of a commit; the
+    # longest such run found counts as stored and only the rest is replayed.
+    def _replay(self, stored):
+        batches = self.wal.read()
+        if not batches:
+            return
+        start = min(position for position, _ in batches)
+        stored_digests = [ledger_fingerprint(stored, n) for n in range(min(start, len(stored)) + 1, len(stored) + 1)]
+        offset = len(stored) - len(stored_digests)
+        cursor = 0
+        replayed = []
+        for position, entries in batches:
+            logged = LedgerBuffer()
+            logged.append(entries)
+            frame = logged.frame()
+            digests = [ledger_fingerprint(frame, n) for n in range(1, len(entries) + 1)]
+            found, found_at = 0, None
+            for at in range(max(position - offset, cursor), len(stored_digests)):
+                matched = 0
+                while matched < len(digests) and at + matched < len(stored_digests) and stored_digests[at + matched] == digests[matched]:
+                    matched += 1
+                if matched > found:
+                    found, found_at = matched, at
+                    if found == len(digests):
+                        break
+            if found_at is not None:
+                cursor = found_at + found
+            if found < len(entries):
+                missing = entries[found:]
+                replayed.append((self._buffer.size, missing))
+                self._buffer.append(missing)
+        self._pending = replayed
+        self._pending_since = [time.time()] * len(replayed)
+        self.wal.write(replayed)
+        if replayed:
+            self._start_writer()
+
+    # Latest checkpoint that was taken from these same ledger entries, optionally
+    # only among those covering dates up to date. Departments added since the
+    # checkpoint had no entries before it, so they start at zero.
+    def _latest_checkpoint(self, ledger, departments, date=None):
+        for position, checkpoint_date in reversed(self.checkpoints.list()):
+            if position > len(ledger) or (date is not None and checkpoint_date > date):
+                continue
+            checkpoint = self.checkpoints.read(position, checkpoint_date)
+            if checkpoint['fingerprint'] != ledger_fingerprint(ledger, position):
+                continue
+            if not set(checkpoint['departments']) <= set(departments):
+                continue
+            checkpoint['overview'] = checkpoint['overview'].reindex(columns=OVERVIEW_BASE_COLUMNS + list(departments), fill_value=0)
+            return checkpoint
+        return None
+
+    # Overview for a freshly read ledger: the latest checkpoint plus a replay of the entries after it
+    def _overview_from_checkpoint(self, ledger, departments):
+        checkpoint = self._latest_checkpoint(ledger, departments)
+        if checkpoint is None:
+            self._checkpoint_position = 0
+            return compute_overview(ledger, departments)
+        self._checkpoint_position = checkpoint['position']
+        tail = compute_overview(ledger.iloc[checkpoint['position']:], departments)
+        return add_overview(checkpoint['overview'], tail, departments)
+
+    def _write_checkpoint(self, snapshot):
+        position = len(snapshot.ledger)
+        latest = pd.to_datetime(snapshot.ledger['Date'], errors='coerce', format='mixed').max()
+        date = '0000-00-00' if pd.isna(latest) else latest.strftime("%Y-%m-%d")
+        self.checkpoints.write(position, date, ledger_fingerprint(snapshot.ledger, position), snapshot.overview)
+        self.checkpoints.write_ledger(self._buffer.to_arrays())
+        self._checkpoint_position = position
+
+    # Take a checkpoint of the current overview now
+    def checkpoint(self):
+        with self._lock:
+            self._write_checkpoint(self.snapshot())
+
+    # Stock as it stood at the end of the given date. Starts from the latest
+    # checkpoint whose entries are all dated on or before it and adds the later
+    # entries that are, instead of replaying the whole ledger.
+    def overview_as_of(self, date, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        date = pd.Timestamp(date).strftime("%Y-%m-%d")
+        departments = snapshot.all_departments
+        with self._lock:
+            checkpoint = self._latest_checkpoint(snapshot.ledger, departments, date)
+        start = 0 if checkpoint is None else checkpoint['position']
+        base = empty_overview(departments) if checkpoint is None else checkpoint['overview']
+        positions = self.ledger_index(snapshot).select(end=date)
+        delta = compute_overview(snapshot.ledger.iloc[positions[positions >= start]], departments)
+        return add_overview(base, delta, departments)
+
+    # Latest snapshot, reloaded first if the store changed on disk. While our
+    # own commits are still being written the store is behind us, so changes
+    # from elsewhere are only picked up once they are in.
+    def snapshot(self):
+        with self._lock:
+            if self._snapshot is None or (not self._pending and self.store.stamp() != self._stamp):
+                self._load()
+            return self._snapshot
+
+    # Filter index over a snapshot's ledger (see ledger_index.py). The index for
+    # the current data is kept and only extended with rows appended since.
+    def ledger_index(self, snapshot):
+        with self._lock:
+            cached = self._ledger_index
+            if snapshot.version < self._base_version:
+                return LedgerIndex().extended(snapshot.ledger)
+            if cached is None or cached.size > len(snapshot.ledger):
+                cached = LedgerIndex()
+            if cached.size < len(snapshot.ledger):
+                cached = cached.extended(snapshot.ledger)
+            self._ledger_index = cached
+            return cached
+
+    # Monthly rollup of a snapshot's ledger (see analytics.py). The rollup of the
+    # current data is built once and commits extend it with their entries only.
+    def rollup(self, snapshot):
+        with self._lock:
+            cached = self._rollup
+            if snapshot.version < self._base_version or (cached is not None and cached.size > len(snapshot.ledger)):
+                return Rollup().extended(snapshot.ledger)
+            cached = (cached or Rollup()).extended(snapshot.ledger)
+            self._rollup = cached
+            return cached
+
+    # Item catalogue (see catalogue.py) of the current overview; it also knows
+    # the items of earlier snapshots since the last reload
+    def catalogue(self, snapshot):
+        with self._lock:
+            if snapshot.version < self._base_version:
+                return ItemCatalogue.from_overview(snapshot.overview)
+            if self._catalogue is None:
+                self._catalogue = ItemCatalogue.from_overview(self.snapshot().overview)
+            return self._catalogue
+
+    def _changed_since(self, item_name, version):
+        return self._base_version > version or self._item_versions.get(item_name, 0) > version
+
+    # Check entries in order against the committed Admin balances and fill in
+    # each entry's 'Current Stock' from those balances. Issues can only go to
+    # active departments. A negative receipt (stock transferred to another
+    # store, see stores.py) cannot take more than the Admin stock either.
+    def _validate(self, current, entries):
+        balances = {}
+        checked = []
+        for entry in entries:
+            item_name = entry['Item Name']
+            quantity = entry['Quantity Issued']
+            department = entry['Department']
+            if department != ADMIN and department not in current.departments:
+                if department in current.archived:
+                    raise DepartmentError(f"Department '{department}' is archived")
+                raise DepartmentError(f"Unknown department '{department}'")
+            stock = balances[item_name] if item_name in balances else admin_stock(current.overview, item_name, current.index)
+            if department == ADMIN and -quantity > stock:
+                raise StockError(item_name, stock)
+            if department == ADMIN:
+                stock += quantity
+            elif quantity > stock:
+                raise StockError(item_name, stock)
+            else:
+                stock -= quantity
+            balances[item_name] = stock
+            checked.append(dict(entry, **{'Current Stock': stock}))
+        return checked
+
+    # Validate and append entries as one serialized transaction. With
+    # expected_version (the snapshot version the caller based its decision on),
+    # a ConflictError is raised if any of the items was written since then.
+    @timed('commit', rows=lambda result, self, entries, expected_version=None: len(entries))
+    def commit(self, entries, expected_version=None):
+        with self._lock:
+            current = self.snapshot()
+            if expected_version is not None:
+                stale = [e['Item Name'] for e in entries if self._changed_since(e['Item Name'], expected_version)]
+                if stale:
+                    raise ConflictError(list(dict.fromkeys(stale)))
+            entries = self._validate(current, entries)
+            if self._write_behind:
+                self.wal.append(self._buffer.size, entries)
+                self._pending.append((self._buffer.size, entries))
+                self._pending_since.append(time.time())
+                self._start_writer()
+            else:
+                self.store.append(entries)
+            self._buffer.append(entries)
+            ledger = self._buffer.frame()
+            overview = current.overview.copy()
+            index = copy_index(current.index)
+            departments = current.all_departments
+            if len(entries) == 1:
+                overview = apply_entry(overview, entries[0], departments, index)
+            else:
+                delta = compute_overview(pd.DataFrame(entries), departments)
+                overview = add_overview(overview, delta, departments, index)
+            self._publish(ledger, overview, index)
+            if self._rollup is not None:
+                self._rollup = self._rollup.extended(ledger)
+            if self._catalogue is not None:
+                self._catalogue = self._catalogue.extended([e['Item Name'] for e in entries], [e['Type'] for e in entries])
+            for entry in entries:
+                self._item_versions[entry['Item Name']] = self._version
+            if len(ledger) - self._checkpoint_position >= CHECKPOINT_INTERVAL:
+                self._write_checkpoint(self._snapshot)
+            return self._snapshot
+
+    # Replace the whole ledger and rebuild the overview from it. Departments it
+    # has entries for that are not registered are registered as archived.
+    def write_ledger(self, ledger_df):
+        with self._lock:
+            self.snapshot()
+            # The new ledger replaces the commits still waiting to be written
+            self._discard_pending()
+            self.store.write_ledger(ledger_df)
+            self.checkpoints.clear()
+            self._checkpoint_position = 0
+            self._buffer = LedgerBuffer.from_frame(ledger_df)
+            ledger = self._buffer.frame()
+            register = dict(self._departments)
+            if self._register_ledger_departments(register, ledger):
+                self._write_register(register)
+            self._publish(ledger, compute_overview(ledger, list(register)), reset=True)
+
+    # Store a new overview. Department columns it has that are not registered
+    # are registered as active; registered ones it lacks hold nothing.
+    def write_overview(self, overview_df):
+        with self._lock:
+            current = self.snapshot()
+            register = dict(self._departments)
+            new = [name for name in overview_departments(overview_df) if name not in register]
+            if new:
+                register.update(dict.fromkeys(new, False))
+                self._write_register(register)
+            overview_df = overview_df.reindex(columns=OVERVIEW_BASE_COLUMNS + list(register), fill_value=0)
+            self._own_write(self.store.write_overview, overview_df)
+            self._catalogue = None
+            self._publish(current.ledger, overview_df)
+
+    # Add an active department, or bring back an archived one. A new department
+    # holds nothing yet, so this only adds a zero column: O(items), no replay.
+    def add_department(self, name):
+        with self._lock:
+            current = self.snapshot()
+            if not name.strip():
+                raise DepartmentError("A department needs a name.")
+            if name == ADMIN or self._departments.get(name) is False:
+                raise DepartmentError(f"Department '{name}' already exists.")
+            if not _is_department_name(name):
+                raise DepartmentError(f"'{name}' is an overview column and cannot be a department.")
+            overview = current.overview
+            if name not in self._departments:
+                overview = overview.assign(**{name: 0})
+            self._write_register(dict(self._departments, **{name: False}))
+            self._publish(current.ledger, overview, current.index)
+
+    # Retire a department: nothing more can be issued to it, but it keeps its
+    # overview column and the stock it holds. No replay and no overview change.
+    def archive_department(self, name):
+        with self._lock:
+            current = self.snapshot()
+            if self._departments.get(name):
+                raise DepartmentError(f"Department '{name}' is already archived.")
+            if name not in self._departments:
+                raise DepartmentError(f"Department '{name}' does not exist.")
+            self._write_register(dict(self._departments, **{name: True}))
+            self._publish(current.ledger, current.overview, current.index)
+
+    def delete(self):
+        with self._lock:
+            self._discard_pending()
+            self.store.delete()
+            self.checkpoints.clear()
+            self._checkpoint_position = 0
+            self._buffer = LedgerBuffer()
+            ledger = self._buffer.frame()
+            self._departments = {name: False for name in self.default_departments}
+            self._publish(ledger, empty_overview(self.default_departments), reset=True)
+
+
+    def _start_writer(self):
+        self._wake.set()
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer, name=f'store-writer:{self.store.base_name}', daemon=True)
+            self._writer.start()
+
+    # Runs until close(), which cuts its waits short
+    def _run_writer(self):
+        while not self._closing.is_set():
+            self._wake.wait()
+            self._closing.wait(FLUSH_DELAY)
+            self._wake.clear()
+            try:
+                self._write_pending()
+            except Exception:
+                # Kept in the log and in self._write_error; try again later
+                self._closing.wait(RETRY_DELAY)
+                self._wake.set()
+
+    # Append every pending commit to the store in one write. The store write
+    # runs without the lock, so commits carry on meanwhile. After a failed log
+    # rewrite nothing may be pending, but the log is rewritten again.
+    def _write_pending(self):
+        with self._lock:
+            if self._in_flight or not (self._pending or self._write_error):
+                return
+            batches = list(self._pending)
+            self._in_flight = len(batches)
+            changed_elsewhere = self._changed_elsewhere or self.store.stamp() != self._stamp
+        try:
+            if batches:
+                self.store.append([entry for _, entries in batches for entry in entries])
+                with self._lock:
+                    del self._pending[:len(batches)]
+                    del self._pending_since[:len(batches)]
+                    self._changed_elsewhere = False
+                    # Another process wrote too: reload once our commits are all in
+                    self._stamp = None if changed_elsewhere else self.store.stamp()
+            with self._lock:
+                # Commits already stored but still logged are recognised by _replay
+                self.wal.write(self._pending)
+                self._write_error = None
+        except Exception as e:
+            with self._lock:
+                self._write_error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight = 0
+                self._written.notify_all()
+
+    # Wait until the background writer is not writing to the store. Called with
+    # the lock held before other store writes, which it then cannot overlap.
+    def _wait_for_writer(self):
+        while self._in_flight:
+            self._written.wait()
+
+    def _discard_pending(self):
+        self._wait_for_writer()
+        self._pending = []
+        self._pending_since = []
+        self._changed_elsewhere = False
+        if self._write_behind:
+            self.wal.clear()
+
+    # Write every pending commit to the store now. The writer thread may take
+    # a batch between our wait and our write, so this waits again until
+    # nothing is pending or being written.
+    def flush(self):
+        while True:
+            with self._lock:
+                self._wait_for_writer()
+                if not self._pending and self._write_error is None:
+                    return
+            self._write_pending()
+
+    def write_status(self):
+        with self._lock:
+            entries = sum(len(entries) for _, entries in self._pending)
+            oldest = time.time() - self._pending_since[0] if self._pending_since else 0.0
+            return WriteStatus(bool(self._write_behind), entries, len(self._pending), oldest, self._write_error)
+
+    # Write what is pending, stop the writer and give up the log. The log is
+    # released only once the writer has stopped writing to it.
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._closing.set()
+            self._wake.set()
+            if self._writer is not None and self._writer is not threading.current_thread():
+                self._writer.join()
+            self.wal.release()
+
+
+_datastores = {}
+_datastores_lock = threading.Lock()
+
+# The shared DataStore for a store name, created on first use in this process
+def get_datastore(base_name, default_departments, backend=None):
+    with _datastores_lock:
+        key = (base_name, backend)
+        if key not in _datastores:
+            _datastores[key] = DataStore(open_store(base_name, backend), default_departments)
+        return _datastores[key]
+
+# Drop the shared DataStore for a store name, e.g. when a job is done with a
+# scratch store. Its pending commits are written first.
+def release_datastore(base_name, backend=None):
+    with _datastores_lock:
+        data = _datastores.pop((base_name, backend), None)
+    if data is not None:
+        data.close()
+
+# Write every store's pending commits before the interpreter exits; whatever
+# cannot be written stays in the write-ahead log for the next start
+@atexit.register
+def _close_datastores():
+    with _datastores_lock:
+        datastores = list(_datastores.values())
+    for data in datastores:
+        try:
+            data.close()
+        except Exception:
+            pass
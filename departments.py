@@ -1,24 +1,35 @@
 import streamlit as st
+from balance import build_index
+from utils import SERVICE
+
+# Point this session at the stored departments and overview after a change
+def refresh_departments():
+    snapshot = SERVICE.snapshot()
+    st.session_state.departments = list(snapshot.departments)
+    st.session_state.inventory = snapshot.overview.copy()
+    st.session_state.item_index = build_index(st.session_state.inventory)
 
 def manage_departments():
     st.header('Manage Departments')
-    new_dept = st.text_input("New Department")
+    new_dept = st.text_input("New Department").strip()
     add_dept = st.button("Add Department")
-    remove_dept = st.selectbox("Remove Department", st.session_state.departments)
-    remove_button = st.button("Remove Department")
+    archive_dept = st.selectbox("Archive Department", st.session_state.departments)
+    archive_button = st.button("Archive Department")
 
     if add_dept and new_dept:
-        if new_dept not in st.session_state.departments:
-            st.session_state.departments.append(new_dept)
-            st.session_state.inventory[new_dept] = 0  # Add new column to inventory
-            st.success(f"Department '{new_dept}' added.")
+        try:
+            SERVICE.add_department(new_dept)
+        except ValueError as e:
+            st.warning(str(e))
         else:
-            st.warning(f"Department '{new_dept}' already exists.")
+            refresh_departments()
+            st.success(f"Department '{new_dept}' added.")
 
-    if remove_button:
-        if remove_dept in st.session_state.departments:
-            st.session_state.departments.remove(remove_dept)
-            st.session_state.inventory.drop(columns=[remove_dept], inplace=True)  # Remove column from inventory
-            st.success(f"Department '{remove_dept}' removed.")
+    if archive_button:
+        try:
+            SERVICE.archive_department(archive_dept)
+        except ValueError as e:
+            st.warning(str(e))
         else:
-            st.warning(f"Department '{remove_dept}' does not exist.")
+            refresh_departments()
+            st.success(f"Department '{archive_dept}' archived. The stock it holds is still counted.")
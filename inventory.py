@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime
-from utils import load_ledger, load_overview, save_ledger, save_overview, update_inventory
+from utils import SERVICE, append_ledger
+from balance import admin_stock, apply_entry, overview_departments
+from datastore import DepartmentError, StockError
 
 def display_inventory():
     st.header('Inventory Overview')
@@ -24,14 +24,14 @@ def add_stock():
         submitted = st.form_submit_button("Add Stock")
         
         if submitted:
-            add_transaction(date.strftime("%Y-%m-%d"), item_type, item_name, 'Admin', quantity, vendor_name, invoice_number)
-            st.success(f"Added {quantity} units of {item_name} to Admin inventory")
+            if add_transaction(date.strftime("%Y-%m-%d"), item_type, item_name, 'Admin', quantity, vendor_name, invoice_number):
+                st.success(f"Added {quantity} units of {item_name} to Admin inventory")
 
 def issue_items():
     st.header('Issue Items to Departments')
     
     item_type = st.selectbox("Item Type", ["Asset", "Consumable"])
-    item_names = st.session_state.inventory[st.session_state.inventory['Type'] == item_type]['Item Name'].unique()
+    item_names = st.session_state.item_index.by_type.get(item_type, [])
     
     with st.form("issue_items_form"):
         date = st.date_input("Date")
@@ -41,37 +41,30 @@ def issue_items():
         submitted = st.form_submit_button("Issue Items")
         
         if submitted:
-            current_stock = st.session_state.inventory.loc[st.session_state.inventory['Item Name'] == item_name, 'Admin'].values[0]
+            current_stock = admin_stock(st.session_state.inventory, item_name, st.session_state.item_index)
             if quantity <= current_stock:
-                add_transaction(date.strftime("%Y-%m-%d"), item_type, item_name, department, quantity, "", "")
-                st.success(f"Issued {quantity} units of {item_name} to {department}")
+                if add_transaction(date.strftime("%Y-%m-%d"), item_type, item_name, department, quantity, "", ""):
+                    st.success(f"Issued {quantity} units of {item_name} to {department}")
             else:
                 st.error(f"Not enough {item_name} in inventory to issue. Available: {current_stock}")
 
 def add_transaction(date, item_type, item_name, department, quantity, vendor_name, invoice_number):
-    if item_name not in st.session_state.inventory['Item Name'].values:
-        new_row = {'Item Name': item_name, 'Type': item_type, 'Total': 0, 'Admin': 0}
-        for dept in st.session_state.departments:
-            new_row[dept] = 0
-        st.session_state.inventory = pd.concat([st.session_state.inventory, pd.DataFrame([new_row])], ignore_index=True)
-    
-    current_stock = st.session_state.inventory.loc[st.session_state.inventory['Item Name'] == item_name, 'Admin'].values[0]
-    
-    if department != 'Admin' and quantity > current_stock:
-        st.error(f"Not enough {item_name} in inventory to issue. Available: {current_stock}")
-        return
-    
     new_entry = {
         'Date': date,
         'Type': item_type,
-        'Item Name': item_name,
+        'Item Name': SERVICE.catalogue().canonical(item_name),
         'Department': department,
         'Quantity Issued': quantity,
-        'Current Stock': current_stock - quantity if department != 'Admin' else current_stock + quantity,
         'Vendor Name': vendor_name,
         'Invoice Number': invoice_number
     }
-    st.session_state.ledger = pd.concat([st.session_state.ledger, pd.DataFrame([new_entry])], ignore_index=True)
-    st.session_state.inventory = update_inventory(st.session_state.ledger)
-    save_ledger(st.session_state.ledger)
-    save_overview(st.session_state.inventory)
+    # Stock is re-checked against the committed data before the entry is written
+    try:
+        snapshot = append_ledger([new_entry])
+    except (StockError, DepartmentError) as e:
+        st.error(str(e))
+        return False
+    st.session_state.ledger = snapshot.ledger
+    departments = overview_departments(st.session_state.inventory)
+    st.session_state.inventory = apply_entry(st.session_state.inventory, new_entry, departments, st.session_state.item_index)
+    return True
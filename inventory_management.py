@@ -1,7 +1,15 @@
+import hmac
+import os
 import streamlit as st
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import os
+from matplotlib.figure import Figure
+from balance import OVERVIEW_BASE_COLUMNS, build_index, overview_departments
+from datastore import ConflictError, DepartmentError, StockError
+from inventory_service import ASSET_TYPES
+from ledger_index import page_bounds
+import metrics
+import stores
 
 # Add custom CSS for wide mode
 st.markdown(
@@ -17,155 +25,89 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Define filename and sheet names
-FILE_NAME = 'Inventory.xlsx'
-LEDGER_SHEET = 'Ledger'
-OVERVIEW_SHEET = 'Overview'
-DEFAULT_DEPARTMENTS = [
-    'Junior block', 'Middle block', 'Senior block', 'Sports', 
-    'Arts', 'Boys hostel', 'Girls hostel', 'Owner'
-]
-ASSET_TYPES = [
-    'Housekeeping assets', 'Housekeeping consumables', 'Electrical equipment', 
-    'Hardware', 'Gardening equipment', 'Stationary', 
-    'Furnitures and fixtures', 'Sports equipment'
-]
-
-# Initialize session state for data persistence
-if 'ledger' not in st.session_state:
-    st.session_state.ledger = pd.DataFrame(columns=[
-        'Date', 'Type', 'Item Name', 'Department', 'Quantity Issued', 'Current Stock', 
-        'Vendor Name', 'Invoice Number', 'Total Price'
-    ])
-if 'inventory' not in st.session_state:
-    st.session_state.inventory = pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + DEFAULT_DEPARTMENTS)
-if 'departments' not in st.session_state:
-    st.session_state.departments = DEFAULT_DEPARTMENTS
+PAGE_SIZES = [50, 100, 250, 500]
+# Items offered at a time in the item pickers; typing narrows them down
+ITEM_CHOICES = 50
+# The Diagnostics page is only offered with metrics on (metrics.py) and this password set
+ADMIN_PASSWORD = os.environ.get('INVENTORY_ADMIN_PASSWORD', '')
+
+# Initialize session state
 if 'page' not in st.session_state:
     st.session_state.page = 'Overview'
 
-# Load the ledger from the Excel file
-def load_ledger():
-    if os.path.exists(FILE_NAME):
-        try:
-            return pd.read_excel(FILE_NAME, sheet_name=LEDGER_SHEET, engine='openpyxl')
-        except ValueError:
-            return pd.DataFrame(columns=[
-                'Date', 'Type', 'Item Name', 'Department', 'Quantity Issued', 'Current Stock', 
-                'Vendor Name', 'Invoice Number', 'Total Price'
-            ])
-    else:
-        return pd.DataFrame(columns=[
-            'Date', 'Type', 'Item Name', 'Department', 'Quantity Issued', 'Current Stock', 
-            'Vendor Name', 'Invoice Number', 'Total Price'
-        ])
-
-# Load the overview (inventory) from the Excel file
-def load_overview():
-    if os.path.exists(FILE_NAME):
-        try:
-            df = pd.read_excel(FILE_NAME, sheet_name=OVERVIEW_SHEET, engine='openpyxl')
-            # Extract departments from the columns, excluding non-department columns
-            department_cols = [col for col in df.columns if col not in ['Item Name', 'Type', 'Total', 'Admin']]
-            st.session_state.departments = department_cols if department_cols else DEFAULT_DEPARTMENTS
-            return df
-        except ValueError:
-            st.session_state.departments = DEFAULT_DEPARTMENTS
-            return pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + st.session_state.departments)
-    else:
-        st.session_state.departments = DEFAULT_DEPARTMENTS
-        return pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + st.session_state.departments)
-
-# Save the ledger to the Excel file
-def save_ledger(ledger_df):
-    if not os.path.exists(FILE_NAME):
-        with pd.ExcelWriter(FILE_NAME, engine='openpyxl', mode='w') as writer:
-            ledger_df.to_excel(writer, sheet_name=LEDGER_SHEET, index=False)
-    else:
-        with pd.ExcelWriter(FILE_NAME, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            ledger_df.to_excel(writer, sheet_name=LEDGER_SHEET, index=False)
-
-# Save the overview (inventory) to the Excel file
-def save_overview(overview_df):
-    if not os.path.exists(FILE_NAME):
-        with pd.ExcelWriter(FILE_NAME, engine='openpyxl', mode='w') as writer:
-            overview_df.to_excel(writer, sheet_name=OVERVIEW_SHEET, index=False)
-    else:
-        with pd.ExcelWriter(FILE_NAME, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            overview_df.to_excel(writer, sheet_name=OVERVIEW_SHEET, index=False)
-
-# Initialize data from files
-if 'ledger_initialized' not in st.session_state:
-    st.session_state.ledger = load_ledger()
-    st.session_state.ledger_initialized = True
-if 'inventory_initialized' not in st.session_state:
-    st.session_state.inventory = load_overview()
-    st.session_state.inventory_initialized = True
-
-# Helper functions
-def update_inventory(ledger_df):
-    inventory = pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + st.session_state.departments)
-    for index, row in ledger_df.iterrows():
-        if row['Item Name'] not in inventory['Item Name'].values:
-            new_row = {'Item Name': row['Item Name'], 'Type': row['Type'], 'Total': 0, 'Admin': 0}
-            for dept in st.session_state.departments:
-                new_row[dept] = 0
-            inventory = pd.concat([inventory, pd.DataFrame([new_row])], ignore_index=True)
-        
-        item_row = inventory[inventory['Item Name'] == row['Item Name']].index[0]
-        
-        if row['Department'] == 'Admin':
-            inventory.at[item_row, 'Admin'] += row['Quantity Issued']
-        elif row['Department'] in st.session_state.departments:
-            inventory.at[item_row, row['Department']] += row['Quantity Issued']
-            inventory.at[item_row, 'Admin'] -= row['Quantity Issued']
-        
-        inventory.at[item_row, 'Total'] = inventory.at[item_row, 'Admin'] + sum(inventory.loc[item_row, st.session_state.departments])
-    
-    return inventory
-
-def add_transaction(date, item_type, item_name, department, quantity, vendor_name, invoice_number, total_price):
-    if item_name not in st.session_state.inventory['Item Name'].values:
-        new_row = {'Item Name': item_name, 'Type': item_type, 'Total': 0, 'Admin': 0}
-        for dept in st.session_state.departments:
-            new_row[dept] = 0
-        st.session_state.inventory = pd.concat([st.session_state.inventory, pd.DataFrame([new_row])], ignore_index=True)
-    
-    current_stock = st.session_state.inventory.loc[st.session_state.inventory['Item Name'] == item_name, 'Admin'].values[0]
-    
-    if department != 'Admin' and quantity > current_stock:
-        st.error(f"Not enough {item_name} in inventory to issue. Available: {current_stock}")
-        return
-
-    new_entry = {
-        'Date': date,
-        'Type': item_type,
-        'Item Name': item_name,
-        'Department': department,
-        'Quantity Issued': quantity,
-        'Current Stock': current_stock - quantity if department != 'Admin' else current_stock + quantity,
-        'Vendor Name': vendor_name,
-        'Invoice Number': str(invoice_number),
-        'Total Price': round(total_price,2)
-    }
-    st.session_state.ledger = pd.concat([st.session_state.ledger, pd.DataFrame([new_entry])], ignore_index=True)
-    st.session_state.inventory = update_inventory(st.session_state.ledger)
-    save_ledger(st.session_state.ledger)
-    save_overview(st.session_state.inventory)
+# The inventory core (inventory_service.py) of the store (campus) this session
+# works on; each store is shared by every session in this process
+store_names = stores.store_names()
+if len(store_names) > 1:
+    st.sidebar.selectbox("Store", store_names, key='store')
+STORE = st.session_state.get('store') if st.session_state.get('store') in store_names else store_names[0]
+SERVICE = stores.service(STORE)
+
+# Point this session at the latest shared data, including other sessions' writes
+def sync_session():
+    snapshot = SERVICE.snapshot()
+    if st.session_state.get('data_store') != STORE or st.session_state.get('data_version') != snapshot.version:
+        st.session_state.ledger = snapshot.ledger
+        st.session_state.inventory = snapshot.overview
+        st.session_state.departments = list(snapshot.departments)
+        st.session_state.item_index = snapshot.index
+        st.session_state.data_version = snapshot.version
+        st.session_state.data_store = STORE
+
+sync_session()
+
+# Commit one ledger entry. Stock is checked against the committed data, not this
+# session's copy; with expected_version the commit is refused if the item was
+# changed by another session since that version. Returns True on success.
+def add_transaction(date, item_type, item_name, department, quantity, vendor_name, invoice_number, total_price, expected_version=None):
+    try:
+        SERVICE.add_transaction(
+            date, item_type, item_name, department, quantity, vendor_name, invoice_number, total_price, expected_version
+        )
+    except (StockError, ConflictError, DepartmentError) as e:
+        st.error(str(e))
+        return False
+    finally:
+        sync_session()
+    return True
+
+# Commit a checked batch as one transaction: one store write and one overview update
+def import_batch(entries, expected_version=None):
+    try:
+        SERVICE.commit(entries, expected_version)
+    except (StockError, ConflictError, DepartmentError) as e:
+        st.error(str(e))
+        return False
+    finally:
+        sync_session()
+    return True
 
 def delete_inventory_file():
-    if os.path.exists(FILE_NAME):
-        os.remove(FILE_NAME)
-        st.success(f"Deleted {FILE_NAME}")
-        # Clear session state and reinitialize
-        st.session_state.ledger = pd.DataFrame(columns=[
-            'Date', 'Type', 'Item Name', 'Department', 'Quantity Issued', 'Current Stock', 
-            'Vendor Name', 'Invoice Number', 'Total Price'
-        ])
-        st.session_state.inventory = pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + DEFAULT_DEPARTMENTS)
-        st.session_state.departments = DEFAULT_DEPARTMENTS
+    if SERVICE.delete():
+        st.success("Deleted the inventory data")
+        sync_session()
     else:
-        st.error(f"{FILE_NAME} does not exist")
+        st.error("There is no inventory data to delete")
+
+# Show one page of the given row positions of a frame. Only the visible rows
+# are sliced out and styled.
+def show_page(frame, positions, key):
+    page_key = f'{key}_page'
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f'{key}_page_size')
+    page, pages, start, stop = page_bounds(len(positions), st.session_state.get(page_key, 1), page_size)
+    st.session_state[page_key] = page
+    with col2:
+        st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key)
+    with metrics.timer(f'render.{key}') as t:
+        visible = frame.iloc[positions[start:stop]]
+        st.dataframe(
+            visible.style.set_properties(**{'width': 'auto'}),
+            column_config={'Date': st.column_config.DateColumn(format="YYYY-MM-DD")}
+        )
+        t.rows = len(visible)
+    st.caption(f"Showing {start + 1 if stop else 0}-{stop} of {len(positions)} rows")
 
 # Sidebar
 st.sidebar.title("Navigation")
@@ -173,38 +115,167 @@ if st.sidebar.button("Overview"):
     st.session_state.page = "Overview"
 if st.sidebar.button("Ledger"):
     st.session_state.page = "Ledger"
+if st.sidebar.button("Dashboard"):
+    st.session_state.page = "Dashboard"
 if st.sidebar.button("Add Stock"):
     st.session_state.page = "Add Stock"
 if st.sidebar.button("Issue Items"):
     st.session_state.page = "Issue Items"
+if st.sidebar.button("Bulk Import"):
+    st.session_state.page = "Bulk Import"
 if st.sidebar.button("Manage Departments"):
     st.session_state.page = "Manage Departments"
+if st.sidebar.button("Stores"):
+    st.session_state.page = "Stores"
 if st.sidebar.button("Delete Inventory File"):
     st.session_state.page = "Delete Inventory File"
 if st.sidebar.button("Download Inventory File"):
     st.session_state.page = "Download Inventory File"
+if metrics.ENABLED and ADMIN_PASSWORD and st.sidebar.button("Diagnostics"):
+    st.session_state.page = "Diagnostics"
+
+# Health of the background writes to the store
+status = SERVICE.persistence_status()
+if status.error is not None:
+    st.sidebar.error(f"Saving is failing ({status.error}); {status.pending_entries} entries are kept in the write-ahead log and will be retried")
+elif status.pending_commits:
+    st.sidebar.caption(f"Saving {status.pending_entries} entries ({status.oldest_seconds:.1f}s)")
+elif status.write_behind:
+    st.sidebar.caption("All changes saved")
+else:
+    st.sidebar.caption("All changes saved (written directly: another process holds the write-ahead log)")
 
 # Streamlit app
 st.title('School Inventory Management')
+if len(store_names) > 1:
+    st.caption(f"Store: {STORE}")
 
 if st.session_state.page == "Overview":
     st.header('Inventory Overview')
-    inventory = st.session_state.inventory.copy()
-    st.dataframe(inventory.style.set_properties(**{'width': 'auto'}))
+    with st.expander("Filters"):
+        col1, col2 = st.columns(2)
+        with col1:
+            types = st.multiselect("Item Type", ASSET_TYPES, key='overview_types')
+            as_of = st.date_input("Stock as of (leave empty for today)", value=None, key='overview_as_of')
+        with col2:
+            departments = st.multiselect("Held by department", overview_departments(st.session_state.inventory), key='overview_departments')
+
+    if as_of is not None:
+        inventory = SERVICE.overview_as_of(as_of)
+        item_index = build_index(inventory)
+    else:
+        inventory = st.session_state.inventory
+        item_index = st.session_state.item_index
+    if types:
+        positions = np.sort([item_index.rows[name] for t in types for name in item_index.by_type.get(t, [])]).astype(int)
+    else:
+        positions = np.arange(len(inventory))
+    columns = list(inventory.columns)
+    if departments:
+        held = (inventory[departments].iloc[positions] > 0).any(axis=1).to_numpy()
+        positions = positions[held]
+        columns = OVERVIEW_BASE_COLUMNS + departments
+    show_page(inventory[columns], positions, 'overview')
     
 elif st.session_state.page == "Ledger":
     st.header('Transaction Ledger')
-    st.dataframe(st.session_state.ledger.style.set_properties(**{'width': 'auto'}))
+    snapshot = SERVICE.snapshot()
+    ledger_index = SERVICE.ledger_index(snapshot)
+    with st.expander("Filters"):
+        col1, col2 = st.columns(2)
+        with col1:
+            date_range = st.date_input("Date range", value=(), key='ledger_dates')
+            departments = st.multiselect("Department", ['Admin'] + snapshot.all_departments, key='ledger_departments')
+            types = st.multiselect("Item Type", ASSET_TYPES, key='ledger_types')
+        with col2:
+            vendors = st.multiselect("Vendor", ledger_index.values('Vendor Name'), key='ledger_vendors')
+            invoice = st.text_input("Invoice Number", key='ledger_invoice').strip()
+
+    start_date = date_range[0] if len(date_range) > 0 else None
+    end_date = date_range[1] if len(date_range) > 1 else start_date
+    positions = ledger_index.select(
+        {'Department': departments, 'Type': types, 'Vendor Name': vendors, 'Invoice Number': [invoice] if invoice else []},
+        start=start_date, end=end_date
+    )
+    show_page(snapshot.ledger, positions, 'ledger')
+
+elif st.session_state.page == "Dashboard":
+    st.header('Consumption Dashboard')
+    with st.expander("Filters"):
+        col1, col2 = st.columns(2)
+        with col1:
+            types = st.multiselect("Item Type", ASSET_TYPES, key='dashboard_types')
+            months = st.slider("Months shown", 3, 60, 12, key='dashboard_months')
+        with col2:
+            departments = st.multiselect("Department", overview_departments(st.session_state.inventory), key='dashboard_departments')
+
+    usage = SERVICE.monthly_usage(departments, types).tail(months)
+    spend = SERVICE.monthly_spend(types).tail(months)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Quantity issued per month")
+        if usage.empty:
+            st.info("Nothing has been issued yet")
+        else:
+            figure = Figure(figsize=(6, 4))
+            axes = figure.subplots()
+            usage.plot(ax=axes, marker='o')
+            axes.set_xlabel('')
+            axes.legend(fontsize='small')
+            st.pyplot(figure)
+    with col2:
+        st.subheader("Receipt spend per month")
+        if spend.empty:
+            st.info("No stock has been received yet")
+        else:
+            figure = Figure(figsize=(6, 4))
+            axes = figure.subplots()
+            spend.set_index(spend.index.strftime('%b %Y')).plot.bar(ax=axes, stacked=True)
+            axes.set_xlabel('')
+            axes.legend(fontsize='small')
+            st.pyplot(figure)
+
+    st.subheader("Reorder alerts")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        burn_months = st.number_input("Burn rate over the last (months)", 1, 24, 3, key='dashboard_burn_months')
+    with col2:
+        cover_months = st.number_input("Alert below (months of stock)", 0.5, 24.0, 1.0, step=0.5, key='dashboard_cover_months')
+    with col3:
+        target_months = st.number_input("Order up to (months of stock)", 1.0, 36.0, 3.0, step=0.5, key='dashboard_target_months')
+    alerts = SERVICE.reorder_alerts(types, burn_months=burn_months, cover_months=cover_months, target_months=target_months)
+    if alerts.empty:
+        st.success("Every item has enough Admin stock for its recent usage")
+    else:
+        st.caption(f"{len(alerts)} item(s) will run out within {cover_months:g} month(s) at their recent burn rate")
+        st.dataframe(alerts, hide_index=True)
 
 
 elif st.session_state.page == "Add Stock":
     st.header('Add New Stock')
+    query = st.text_input("Item Name", key='add_stock_query', help="Type part of the name and press Enter to see matching items")
+    item_name = None
+    known_type = None
+    if query.strip():
+        match = SERVICE.match_item(query)
+        new_name = None if match else ' '.join(query.split())
+        options = list(dict.fromkeys(([match] if match else [new_name]) + SERVICE.search_items(query, ITEM_CHOICES)))
+        item_name = st.selectbox(
+            "Add stock to", options, key='add_stock_item',
+            format_func=lambda name: f"{name} (new item)" if name == new_name else name
+        )
+        if item_name == match and match != ' '.join(query.split()):
+            st.info(f"'{query.strip()}' is the existing item '{match}'; the stock will be added to it.")
+        known_type = SERVICE.catalogue().item_type(item_name) if item_name != new_name else None
+
     with st.form("add_stock_form"):
         col1, col2 = st.columns(2)
         with col1:
             date = st.date_input("Date")
-            item_type = st.selectbox("Item Type", ASSET_TYPES)
-            item_name = st.text_input("Item Name")
+            item_type = st.selectbox(
+                "Item Type", ASSET_TYPES, index=ASSET_TYPES.index(known_type) if known_type in ASSET_TYPES else 0,
+                disabled=known_type is not None, key=f'add_stock_type_{known_type}'
+            )
             quantity = st.number_input("Quantity", min_value=1, step=1)
         with col2:
             vendor_name = st.text_input("Vendor Name")
@@ -217,17 +288,27 @@ elif st.session_state.page == "Add Stock":
             if not date or not item_type or not item_name or quantity <= 0:
                 st.error("Please fill in all mandatory fields: Date, Item Type, Item Name, and Quantity.")
             else:
-                add_transaction(
-                    date.strftime("%Y-%m-%d"), item_type, item_name, 'Admin', quantity, 
+                if add_transaction(
+                    date.strftime("%Y-%m-%d"), known_type or item_type, item_name, 'Admin', quantity, 
                     vendor_name, invoice_number, total_price
-                )
-                st.success(f"Added {quantity} units of {item_name} to Admin inventory")
+                ):
+                    st.success(f"Added {quantity} units of {item_name} to Admin inventory")
 
 elif st.session_state.page == "Issue Items":
     st.header('Issue Items to Departments')
     
-    item_type = st.selectbox("Item Type", ASSET_TYPES)
-    item_names = st.session_state.inventory[st.session_state.inventory['Type'] == item_type]['Item Name'].unique()
+    col1, col2 = st.columns(2)
+    with col1:
+        item_type = st.selectbox("Item Type", ASSET_TYPES)
+    with col2:
+        query = st.text_input("Search items", key='issue_query', help="Type part of the name and press Enter")
+    if query.strip():
+        item_names = SERVICE.search_items(query, ITEM_CHOICES, item_type)
+    else:
+        item_names = st.session_state.item_index.by_type.get(item_type, [])
+        if len(item_names) > ITEM_CHOICES:
+            st.caption(f"Showing the first {ITEM_CHOICES} of {len(item_names)} {item_type} items; search to find others.")
+            item_names = item_names[:ITEM_CHOICES]
     
     with st.form("issue_items_form"):
         col1, col2 = st.columns(2)
@@ -241,53 +322,181 @@ elif st.session_state.page == "Issue Items":
         submitted = st.form_submit_button("Issue Items")
         
         if submitted:
-            current_stock = st.session_state.inventory.loc[st.session_state.inventory['Item Name'] == item_name, 'Admin'].values[0]
-            if quantity <= current_stock:
-                add_transaction(date.strftime("%Y-%m-%d"), item_type, item_name, department, quantity, "", "", total_price=None)
+            if not item_name:
+                st.error("Choose an item to issue.")
+            # Checked against the data this form was rendered from, not the data reloaded for this run
+            elif add_transaction(
+                date.strftime("%Y-%m-%d"), item_type, item_name, department, quantity, "", "", total_price=None,
+                expected_version=st.session_state.get('issue_form_version')
+            ):
                 st.success(f"Issued {quantity} units of {item_name} to {department}")
+    st.session_state.issue_form_version = st.session_state.data_version
+
+elif st.session_state.page == "Bulk Import":
+    st.header('Bulk Import')
+    kind = st.radio("Import", ["Stock receipts", "Issues to departments"], horizontal=True)
+    st.caption(
+        "Columns: Date, Type, Item Name and Quantity. Issues also need Department; "
+        "receipts can include Vendor Name, Invoice Number and Total Price."
+    )
+    uploaded_file = st.file_uploader("CSV or Excel file", type=['csv', 'xlsx'])
+
+    if uploaded_file is not None:
+        imported = st.session_state.setdefault('imported_files', set())
+        if uploaded_file.file_id in imported:
+            st.info(f"{uploaded_file.name} has been imported.")
+        else:
+            try:
+                entries, errors = SERVICE.check_batch(uploaded_file, uploaded_file.name, kind == "Stock receipts")
+            except ValueError as e:
+                st.error(str(e))
             else:
-                st.error(f"Not enough {item_name} in inventory to issue. Available: {current_stock}")
+                if len(errors):
+                    st.error(f"Found {len(errors)} problem(s). Nothing was imported; fix the file and upload it again.")
+                    st.dataframe(errors, hide_index=True)
+                elif st.button(f"Import {len(entries)} rows"):
+                    if import_batch(entries, st.session_state.get('bulk_import_version')):
+                        imported.add(uploaded_file.file_id)
+                        st.success(f"Imported {len(entries)} rows from {uploaded_file.name}")
+    st.session_state.bulk_import_version = st.session_state.data_version
 
 elif st.session_state.page == "Manage Departments":
     st.header('Manage Departments')
     with st.container():
-        new_dept = st.text_input("New Department")
+        new_dept = st.text_input("New Department", help="Adding an archived department's name brings it back.").strip()
         add_dept = st.button("Add Department")
         if add_dept and new_dept:
-            if new_dept not in st.session_state.departments:
-                st.session_state.departments.append(new_dept)
-                st.session_state.inventory[new_dept] = 0  # Add new column to inventory
-                st.success(f"Department '{new_dept}' added.")
+            try:
+                SERVICE.add_department(new_dept)
+            except ValueError as e:
+                st.warning(str(e))
             else:
-                st.warning(f"Department '{new_dept}' already exists.")
+                sync_session()
+                st.success(f"Department '{new_dept}' added.")
 
     with st.container():
-        remove_dept = st.selectbox("Remove Department", st.session_state.departments)
-        remove_button = st.button("Remove Department")
-
-        if remove_button:
-            if remove_dept in st.session_state.departments:
-                st.session_state.departments.remove(remove_dept)
-                st.session_state.inventory.drop(columns=[remove_dept], inplace=True)  # Remove column from inventory
-                st.success(f"Department '{remove_dept}' removed.")
+        archive_dept = st.selectbox("Archive Department", st.session_state.departments)
+        archive_button = st.button("Archive Department")
+
+        if archive_button:
+            try:
+                SERVICE.archive_department(archive_dept)
+            except ValueError as e:
+                st.warning(str(e))
             else:
-                st.warning(f"Department '{remove_dept}' does not exist.")
+                sync_session()
+                st.success(f"Department '{archive_dept}' archived. The stock it holds is still counted.")
+
+    archived = SERVICE.archived_departments()
+    if archived:
+        st.subheader('Archived Departments')
+        st.caption("Nothing can be issued to these; the stock they still hold stays in the totals.")
+        st.dataframe(
+            st.session_state.inventory[archived].sum().rename('Items held').rename_axis('Department').reset_index(),
+            hide_index=True
+        )
+
+elif st.session_state.page == "Stores":
+    st.header('Stores')
+    if len(store_names) > 1:
+        st.subheader(f"Transfer stock from {STORE}")
+        with st.form("transfer_form"):
+            date = st.date_input("Date")
+            destination = st.selectbox("To store", [name for name in store_names if name != STORE])
+            query = st.text_input("Item Name", help="The item as it is named in this store")
+            quantity = st.number_input("Quantity", min_value=1, step=1)
+            if st.form_submit_button("Transfer"):
+                try:
+                    reference = stores.transfer(STORE, destination, date.strftime("%Y-%m-%d"), query, quantity)
+                except (StockError, ValueError) as e:
+                    st.error(str(e))
+                else:
+                    st.success(f"Transferred {quantity} units of {SERVICE.match_item(query)} to {destination} ({reference})")
+                finally:
+                    sync_session()
+
+    types = st.multiselect("Item Type", ASSET_TYPES, key='stores_types')
+    st.subheader("Stock per store")
+    combined = stores.combined_overview(types=types)
+    show_page(combined, np.arange(len(combined)), 'stores')
+    usage = stores.combined_usage(types=types).tail(12)
+    if not usage.empty:
+        st.subheader("Quantity issued per month")
+        figure = Figure(figsize=(8, 3))
+        axes = figure.subplots()
+        usage.plot(ax=axes, marker='o')
+        axes.set_xlabel('')
+        axes.legend(fontsize='small')
+        st.pyplot(figure)
+
+    missing = stores.incomplete_transfers()
+    if len(missing):
+        st.warning(f"{len(missing)} transfer(s) left their store but were not received at the destination")
+        st.dataframe(missing[['Store', 'Date', 'Item Name', 'Quantity Issued', 'Vendor Name', 'Invoice Number']], hide_index=True)
+        if st.button("Record the missing receipts"):
+            stores.complete_transfers()
+            sync_session()
+            st.rerun()
+
+    st.subheader("Add a store")
+    new_store = st.text_input("Store name", help="Each store has its own ledger, overview and departments")
+    if st.button("Add Store") and new_store:
+        try:
+            stores.add_store(new_store)
+        except ValueError as e:
+            st.warning(str(e))
+        else:
+            st.success(f"Store '{new_store.strip()}' added. Pick it in the sidebar.")
 
 elif st.session_state.page == "Delete Inventory File":
     st.header('Delete Inventory File')
-    st.warning("This action will delete the Inventory.xlsx file permanently.")
+    st.warning("This action will permanently delete the stored ledger and overview.")
     if st.button("Delete File"):
         delete_inventory_file()
 
 elif st.session_state.page == "Download Inventory File":
     st.header('Download Inventory File')
-    if os.path.exists(FILE_NAME):
-        with open(FILE_NAME, "rb") as file:
-            st.download_button(
-                label="Download Inventory.xlsx",
-                data=file,
-                file_name="Inventory.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+    if SERVICE.has_data():
+        with st.expander("Filters"):
+            col1, col2 = st.columns(2)
+            with col1:
+                date_range = st.date_input("Date range", value=(), key='export_dates')
+                types = st.multiselect("Item Type", ASSET_TYPES, key='export_types')
+            with col2:
+                departments = st.multiselect(
+                    "Department", ['Admin'] + overview_departments(st.session_state.inventory), key='export_departments'
+                )
+        start_date = date_range[0] if len(date_range) > 0 else None
+        end_date = date_range[1] if len(date_range) > 1 else start_date
+        with st.spinner("Preparing the workbook..."):
+            workbook = SERVICE.export_workbook(start=start_date, end=end_date, departments=departments, types=types)
+        st.download_button(
+            label=f"Download {SERVICE.file_name}",
+            data=workbook,
+            file_name=SERVICE.file_name,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    else:
+        st.error("There is no inventory data to export yet")
+
+elif st.session_state.page == "Diagnostics" and metrics.ENABLED and ADMIN_PASSWORD:
+    st.header('Diagnostics')
+    if not st.session_state.get('diagnostics_unlocked'):
+        password = st.text_input("Admin password", type='password', key='diagnostics_password')
+        if st.button("Unlock"):
+            if hmac.compare_digest(password.encode(), ADMIN_PASSWORD.encode()):
+                st.session_state.diagnostics_unlocked = True
+                st.rerun()
+            else:
+                st.error("Wrong password")
     else:
-        st.error(f"{FILE_NAME} does not exist")
+        source = st.radio("Calls", ["This server", "Metrics log (all processes)"], horizontal=True, key='diagnostics_source')
+        calls = metrics.recent_calls() if source == "This server" else metrics.logged_calls()
+        if not calls:
+            st.info("No calls have been recorded yet")
+        else:
+            st.subheader("Timings per operation")
+            st.dataframe(pd.DataFrame(metrics.summary(calls)), hide_index=True)
+            st.subheader("Latest calls")
+            st.dataframe(pd.DataFrame(calls[-200:][::-1]), hide_index=True)
+        st.caption(f"Log file: {os.path.abspath(metrics.LOG_PATH)}")
@@ -0,0 +1,263 @@
+import os
+from metrics import timed
+
+# The inventory core without any UI: ledger, overview, departments and
+# persistence behind one explicit API, for the Streamlit pages, the command
+# line and scripts alike. pandas and the store are only loaded on first use
+# (hence the imports inside methods), so importing this module is instant.
+
+# Name of the default store (see storage.py for the available backends, stores.py for several stores)
+STORE_NAME = 'Inventory'
+DEFAULT_DEPARTMENTS = [
+    'Junior block', 'Middle block', 'Senior block', 'Sports',
+    'Arts', 'Boys hostel', 'Girls hostel', 'Owner'
+]
+ASSET_TYPES = [
+    'Housekeeping assets', 'Housekeeping consumables', 'Electrical equipment',
+    'Hardware', 'Gardening equipment', 'Stationary',
+    'Furnitures and fixtures', 'Sports equipment'
+]
+# Ledger entries read at a time when streaming over the stored ledger
+STREAM_CHUNK_SIZE = 50_000
+
+
+# One store's inventory (see stores.py for several). Reads return the latest shared snapshot (see
+# datastore.py); the frames in it must not be modified in place. Writes raise
+# StockError, ConflictError or DepartmentError (datastore.py) when they are refused.
+class InventoryService:
+    def __init__(self, store_name=STORE_NAME, default_departments=DEFAULT_DEPARTMENTS, backend=None, item_types=ASSET_TYPES):
+        self.store_name = store_name
+        # Name of the exported workbook
+        self.file_name = os.path.basename(store_name) + '.xlsx'
+        self.default_departments = list(default_departments)
+        self.backend = backend
+        self.item_types = list(item_types)
+        self._data = None
+
+    # The shared DataStore, opened on first use
+    @property
+    def data(self):
+        if self._data is None:
+            from datastore import get_datastore
+            self._data = get_datastore(self.store_name, self.default_departments, self.backend)
+        return self._data
+
+    def snapshot(self):
+        return self.data.snapshot()
+
+    def ledger(self):
+        return self.snapshot().ledger
+
+    def overview(self):
+        return self.snapshot().overview
+
+    # Departments stock can be issued to
+    def departments(self):
+        return list(self.snapshot().departments)
+
+    # Retired departments; their overview columns and stock are kept
+    def archived_departments(self):
+        return list(self.snapshot().archived)
+
+    def has_data(self):
+        return self.data.store.exists() or self.data.write_status().pending_commits > 0
+
+    # Commits not yet written from the write-ahead log to the store (see datastore.WriteStatus)
+    def persistence_status(self):
+        # The log is claimed on first load
+        self.snapshot()
+        return self.data.write_status()
+
+    # Write pending commits to the store now, e.g. before reading it with another tool
+    def flush(self):
+        self.data.flush()
+
+    # Overview recomputed from a ledger (the stored one by default) in one pass,
+    # with a column for every department, archived ones included, by default
+    @timed('rebuild_overview', rows=lambda result, self, ledger_df=None, departments=None: len(self.ledger() if ledger_df is None else ledger_df))
+    def rebuild_overview(self, ledger_df=None, departments=None):
+        from balance import compute_overview
+        snapshot = self.snapshot()
+        ledger_df = snapshot.ledger if ledger_df is None else ledger_df
+        return compute_overview(ledger_df, snapshot.all_departments if departments is None else departments)
+
+    # Overview recomputed straight from the stored ledger, read chunk by chunk,
+    # so memory is bounded by the chunk size and the item count rather than the
+    # ledger length. Independent of the cached data, which makes it a check on it.
+    # Returns the overview and the number of ledger entries read.
+    def stream_overview(self, departments=None, chunk_size=STREAM_CHUNK_SIZE):
+        from balance import add_overview, build_index, compute_overview, empty_overview
+        departments = self.data.stored_departments() if departments is None else list(departments)
+        self.data.flush()
+        overview = None
+        rows = 0
+        for chunk in self.data.store.read_ledger_chunks(chunk_size):
+            rows += len(chunk)
+            delta = compute_overview(chunk, departments)
+            if overview is None:
+                overview, index = delta, build_index(delta)
+            else:
+                overview = add_overview(overview, delta, departments, index)
+        return (empty_overview(departments) if overview is None else overview), rows
+
+    # Stock as it stood at the end of the given date
+    def overview_as_of(self, date):
+        return self.data.overview_as_of(date)
+
+    # Filter index over a snapshot's ledger (see ledger_index.py)
+    def ledger_index(self, snapshot=None):
+        return self.data.ledger_index(snapshot or self.snapshot())
+
+    # Monthly quantity and spend rollup of a snapshot's ledger (see analytics.py)
+    def rollup(self, snapshot=None):
+        return self.data.rollup(snapshot or self.snapshot())
+
+    # Quantity issued per month and department, optionally only for some departments and item types
+    def monthly_usage(self, departments=(), types=()):
+        from analytics import monthly_usage
+        return monthly_usage(self.rollup(), list(departments), list(types))
+
+    # Receipt spend per month and item type
+    def monthly_spend(self, types=()):
+        from analytics import monthly_spend
+        return monthly_spend(self.rollup(), list(types))
+
+    # Items whose Admin stock covers less than cover_months of their recent burn
+    # rate, with a suggested order (see analytics.reorder_alerts for the options)
+    def reorder_alerts(self, types=(), **options):
+        from analytics import reorder_alerts
+        snapshot = self.snapshot()
+        return reorder_alerts(self.rollup(snapshot), snapshot.overview, types=list(types), **options)
+
+    # Item search catalogue of a snapshot's overview (see catalogue.py)
+    def catalogue(self, snapshot=None):
+        return self.data.catalogue(snapshot or self.snapshot())
+
+    # Up to limit item names for a typed query, best match first, optionally of one type
+    def search_items(self, query, limit=10, item_type=None):
+        return self.catalogue().search(query, limit, item_type)
+
+    # The existing item a typed name refers to ('mops ' finds 'Mop'), or None
+    def match_item(self, name):
+        return self.catalogue().match(name)
+
+    # Entries with every item name recorded as the existing item it spells, so
+    # 'Mop', 'mop ' and 'Mops' stay one item. New names are trimmed and the
+    # first spelling of a new item in the entries is used for all of them.
+    def _dedupe_names(self, names):
+        from catalogue import clean_name, item_key
+        catalogue = self.catalogue()
+        first = {}
+        return [catalogue.match(name) or first.setdefault(item_key(name), clean_name(name)) for name in names]
+
+    # Commit one receipt (department 'Admin') or issue. The item name is
+    # deduplicated against the catalogue. With expected_version the commit is
+    # refused if the item changed since that snapshot version.
+    # Returns the new snapshot.
+    def add_transaction(self, date, item_type, item_name, department, quantity, vendor_name='', invoice_number='',
+                        total_price=None, expected_version=None):
+        entry = {
+            'Date': date,
+            'Type': item_type,
+            'Item Name': self.catalogue().canonical(item_name),
+            'Department': department,
+            'Quantity Issued': quantity,
+            'Vendor Name': vendor_name,
+            'Invoice Number': str(invoice_number),
+            'Total Price': round(total_price, 2) if total_price is not None else None
+        }
+        return self.data.commit([entry], expected_version)
+
+    # Read a CSV/Excel batch of receipts or issues and check every row against
+    # the current stock. Returns the entries and a frame of problems.
+    def check_batch(self, file, file_name, receipts):
+        from bulk_import import read_batch, validate_batch
+        snapshot = self.snapshot()
+        batch = read_batch(file, file_name)
+        batch['Item Name'] = self._dedupe_names(batch['Item Name'])
+        return validate_batch(batch, snapshot.overview, snapshot.index, snapshot.departments, receipts, self.item_types)
+
+    # Validate and commit ledger entries (e.g. a checked batch) as one
+    # transaction, with item names deduplicated. Returns the new snapshot.
+    def commit(self, entries, expected_version=None):
+        names = self._dedupe_names([entry['Item Name'] for entry in entries])
+        entries = [dict(entry, **{'Item Name': name}) for entry, name in zip(entries, names)]
+        return self.data.commit(entries, expected_version)
+
+    # Replace the whole ledger; the overview is rebuilt from it
+    @timed('save_ledger', rows=lambda result, self, ledger_df: len(ledger_df))
+    def save_ledger(self, ledger_df):
+        self.data.write_ledger(ledger_df)
+
+    # Store an overview; its department columns become the department list
+    @timed('save_overview', rows=lambda result, self, overview_df: len(overview_df))
+    def save_overview(self, overview_df):
+        self.data.write_overview(overview_df)
+
+    # Add a department, or bring back an archived one of that name
+    def add_department(self, name):
+        self.data.add_department(name.strip())
+
+    # Retire a department. Its stock stays counted; nothing more can be issued to it.
+    def archive_department(self, name):
+        self.data.archive_department(name)
+
+    # Path of the workbook with the Ledger and Overview sheets, limited to
+    # ledger entries from start to end (inclusive dates) and to the given
+    # departments ('Admin' for receipts) and item types; empty means all. With an
+    # end date the overview is the stock as of that date. The file is written in
+    # streaming mode and cached until the data changes.
+    def export_file(self, start=None, end=None, departments=(), types=()):
+        from balance import ADMIN, OVERVIEW_BASE_COLUMNS
+        from metrics import timer
+        from storage import ExportCache, write_workbook
+        # Stamp first: if the data changes in between, the file is keyed older than its
+        # content, never newer. Pending commits are written first so the stamp covers them.
+        self.data.flush()
+        stamp = self.data.store.stamp()
+        snapshot = self.snapshot()
+        departments, types = list(departments), list(types)
+        key = {'store': stamp, 'start': start, 'end': end, 'departments': sorted(departments), 'types': sorted(types)}
+
+        def write(path):
+            filtered = bool(departments or types or start is not None or end is not None)
+            positions = None
+            if filtered:
+                positions = self.ledger_index(snapshot).select({'Department': departments, 'Type': types}, start=start, end=end)
+            overview = snapshot.overview if end is None else self.data.overview_as_of(end, snapshot)
+            if types:
+                overview = overview[overview['Type'].isin(types)]
+            if departments:
+                held_by = [d for d in departments if d != ADMIN]
+                counted = ([ADMIN] if ADMIN in departments else []) + held_by
+                overview = overview[(overview[counted] > 0).any(axis=1)][OVERVIEW_BASE_COLUMNS + held_by]
+            with timer('write_workbook') as t:
+                write_workbook(path, snapshot.ledger, overview, positions)
+                t.rows = len(snapshot.ledger) if positions is None else len(positions)
+                t.bytes = os.path.getsize(path)
+
+        return ExportCache(self.store_name).get(key, write)
+
+    # The (optionally filtered, see export_file) workbook, written to target or returned as bytes
+    def export_workbook(self, target=None, **filters):
+        import shutil
+        with open(self.export_file(**filters), 'rb') as f:
+            if target is None:
+                return f.read()
+            if isinstance(target, str):
+                with open(target, 'wb') as out:
+                    shutil.copyfileobj(f, out)
+            else:
+                shutil.copyfileobj(f, target)
+
+    # Delete the stored data, cached exports and any legacy workbook. Returns False if there was nothing to delete.
+    def delete(self):
+        from storage import ExportCache
+        legacy_file = self.store_name + '.xlsx'
+        if not self.has_data() and not os.path.exists(legacy_file):
+            return False
+        self.data.delete()
+        ExportCache(self.store_name).clear()
+        if os.path.exists(legacy_file):
+            os.remove(legacy_file)
+        return True
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Ledger columns that get an exact-match index
+INDEXED_COLUMNS = ['Department', 'Type', 'Vendor Name', 'Invoice Number']
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+# Inverted index over the ledger: the row positions holding each value of the
+# indexed columns, and all row positions sorted by date for range queries.
+# Instances are never modified; extended() returns a new index that reuses the
+# work already done for the rows it has seen.
+class LedgerIndex:
+    def __init__(self, size=0, postings=None, dates=None, date_order=None):
+        self.size = size
+        self.postings = postings if postings is not None else {col: {} for col in INDEXED_COLUMNS}
+        self.dates = dates if dates is not None else np.empty(0, dtype='datetime64[D]')
+        self.date_order = date_order if date_order is not None else _NO_ROWS
+
+    # Index covering every row of ledger, of which the first self.size are already indexed
+    def extended(self, ledger):
+        offset = self.size
+        new = ledger.iloc[offset:]
+        postings = {}
+        for col in INDEXED_COLUMNS:
+            col_postings = dict(self.postings[col])
+            values = new[col].astype(object).fillna('').astype(str)
+            for value, positions in values.groupby(values, sort=False).indices.items():
+                positions = positions + offset
+                old = col_postings.get(value)
+                col_postings[value] = positions if old is None else np.concatenate([old, positions])
+            postings[col] = col_postings
+
+        # Merge the new rows into the date order; unparseable dates sort last
+        new_dates = pd.to_datetime(new['Date'], errors='coerce', format='mixed').to_numpy().astype('datetime64[D]')
+        order = np.argsort(new_dates, kind='stable')
+        sorted_dates = new_dates[order]
+        at = np.searchsorted(self.dates, sorted_dates, side='right')
+        dates = np.insert(self.dates, at, sorted_dates)
+        date_order = np.insert(self.date_order, at, order + offset)
+        return LedgerIndex(len(ledger), postings, dates, date_order)
+
+    # Distinct non-blank values seen in an indexed column
+    def values(self, col):
+        return sorted(value for value in self.postings[col] if value != '')
+
+    # Ascending row positions that match every filter. filters maps an indexed
+    # column to the accepted values (empty means no filter on that column);
+    # start and end are inclusive dates.
+    def select(self, filters=None, start=None, end=None):
+        result = None
+        for col, accepted in (filters or {}).items():
+            if not accepted:
+                continue
+            col_postings = self.postings[col]
+            positions = np.concatenate([col_postings.get(str(value), _NO_ROWS) for value in accepted])
+            result = positions if result is None else np.intersect1d(result, positions)
+
+        if start is not None or end is not None:
+            valid = len(self.dates) - np.count_nonzero(np.isnat(self.dates))
+            lo = 0 if start is None else np.searchsorted(self.dates[:valid], np.datetime64(start, 'D'), side='left')
+            hi = valid if end is None else np.searchsorted(self.dates[:valid], np.datetime64(end, 'D'), side='right')
+            positions = self.date_order[lo:hi]
+            result = positions if result is None else np.intersect1d(result, positions)
+
+        if result is None:
+            return np.arange(self.size)
+        return np.unique(result)
+
+# Clamp a 1-based page number; returns (page, page count, first row, end row)
+def page_bounds(total_rows, page, page_size):
+    pages = max(1, -(-total_rows // page_size))
+    page = min(max(1, int(page)), pages)
+    start = (page - 1) * page_size
+    return page, pages, start, min(start + page_size, total_rows)
@@ -1,15 +1,17 @@
 import streamlit as st
 from inventory import display_inventory, display_ledger, add_stock, issue_items
 from departments import manage_departments
-from utils import load_ledger, load_overview
+from utils import SERVICE, load_ledger, load_overview
+from balance import build_index
 
 # Initialize session state for data persistence
 if 'departments' not in st.session_state:
-    st.session_state.departments = ['Sports', 'Boys Hostel', 'Canteen', 'Girls Hostel', 'Personal']
+    st.session_state.departments = SERVICE.departments()
 if 'ledger' not in st.session_state:
     st.session_state.ledger = load_ledger()
 if 'inventory' not in st.session_state:
     st.session_state.inventory = load_overview()
+    st.session_state.item_index = build_index(st.session_state.inventory)
 
 # Streamlit app
 st.title('School Housekeeping Inventory Management')
@@ -0,0 +1,218 @@
+import collections
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Opt-in timing of the hot paths: store reads and writes, loads, commits,
+# overview rebuilds, exports and table renders. Set INVENTORY_METRICS=1 before
+# the app (or a script) starts to record every call (duration, rows and bytes
+# written) to a rotating JSON-lines log, INVENTORY_METRICS_LOG. When it is off,
+# open_store() hands out the plain store and timed() returns the function
+# itself, so the instrumented code runs exactly as before.
+ENABLED = os.environ.get('INVENTORY_METRICS', '').strip().lower() in ('1', 'true', 'yes', 'on')
+LOG_PATH = os.environ.get('INVENTORY_METRICS_LOG', 'inventory-metrics.log')
+# Rotate the log at this size, keeping this many older files
+LOG_MAX_BYTES = 1_000_000
+LOG_BACKUPS = 3
+# Calls kept in memory for the diagnostics page
+RECENT_CALLS = 5000
+
+_recent = collections.deque(maxlen=RECENT_CALLS)
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def _log():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            import logging
+            from logging.handlers import RotatingFileHandler
+            logger = logging.getLogger('inventory.metrics')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8'))
+            _logger = logger
+        return _logger
+
+# Keep one call's measurements and append them to the log
+def record(operation, seconds, rows=None, nbytes=None, ok=True):
+    call = {
+        'time': datetime.now().isoformat(timespec='milliseconds'),
+        'pid': os.getpid(),
+        'operation': operation,
+        'ms': round(seconds * 1000, 3),
+        'rows': rows,
+        'bytes': nbytes,
+        'ok': ok
+    }
+    _recent.append(call)
+    _log().info(json.dumps(call))
+
+
+# Times a block; set .rows and .bytes inside it to record them too
+class Timer:
+    __slots__ = ('operation', 'rows', 'bytes', 'start')
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.rows = None
+        self.bytes = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.operation, time.perf_counter() - self.start, self.rows, self.bytes, exc_type is None)
+        return False
+
+
+# Stand-in for Timer while metrics are off: measures and keeps nothing
+class _NoTimer:
+    __slots__ = ()
+    rows = bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_NO_TIMER = _NoTimer()
+
+def timer(operation):
+    return Timer(operation) if ENABLED else _NO_TIMER
+
+# Decorator timing every call of a function; rows(result, *args, **kwargs), if
+# given, returns the row count to record
+def timed(operation, rows=None):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        import functools
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Timer(operation) as t:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    t.rows = rows(result, *args, **kwargs)
+            return result
+        return wrapper
+    return decorate
+
+
+# Bytes a write put on disk, from the store stamps taken around it: the size of
+# every file it changed (for SQLite, the whole database), or only the growth for an append
+def _written_bytes(before, after, append):
+    total = 0
+    for old, new in zip(before, after):
+        if new is None or new == old:
+            continue
+        if append and old is not None:
+            total += max(new[1] - old[1], 0)
+        else:
+            total += new[1]
+    return total
+
+def _length(value):
+    return None if value is None else len(value)
+
+
+# Store wrapper (see storage.py for the interface) timing reads and writes
+class InstrumentedStore:
+    def __init__(self, store):
+        self._store = store
+        self._name = type(store).__name__
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
+
+    def _read(self, operation, *args):
+        with Timer(f'{self._name}.{operation}') as t:
+            result = getattr(self._store, operation)(*args)
+            t.rows = _length(result)
+        return result
+
+    def _write(self, operation, data, append=False):
+        with Timer(f'{self._name}.{operation}') as t:
+            before = self._store.stamp()
+            getattr(self._store, operation)(data)
+            t.rows = len(data)
+            t.bytes = _written_bytes(before, self._store.stamp(), append)
+
+    def read_ledger(self):
+        return self._read('read_ledger')
+
+    def read_ledger_from(self, position):
+        return self._read('read_ledger_from', position)
+
+    def read_overview(self):
+        return self._read('read_overview')
+
+    def append(self, entries):
+        self._write('append', entries, append=True)
+
+    def write_ledger(self, ledger_df):
+        self._write('write_ledger', ledger_df)
+
+    def write_overview(self, overview_df):
+        self._write('write_overview', overview_df)
+
+def instrument(store):
+    return InstrumentedStore(store) if ENABLED else store
+
+
+# Calls recorded by this process, oldest first
+def recent_calls():
+    return list(_recent)
+
+# Calls in the metrics log and its rotated files (every process that wrote to
+# it), oldest first; lines cut short by a concurrent write are skipped
+def logged_calls(path=LOG_PATH):
+    calls = []
+    for suffix in [f'.{n}' for n in range(LOG_BACKUPS, 0, -1)] + ['']:
+        try:
+            with open(path + suffix, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        calls.append(json.loads(line))
+                    except ValueError:
+                        pass
+        except FileNotFoundError:
+            pass
+    return calls
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+# Per operation: call count, failures, duration percentiles in ms, median
+# rows and total bytes written, slowest p95 first
+def summary(calls):
+    by_operation = collections.defaultdict(list)
+    for call in calls:
+        by_operation[call['operation']].append(call)
+    rows = []
+    for operation, op_calls in by_operation.items():
+        ms = sorted(call['ms'] for call in op_calls)
+        counts = sorted(call['rows'] for call in op_calls if call.get('rows') is not None)
+        written = [call['bytes'] for call in op_calls if call.get('bytes') is not None]
+        rows.append({
+            'Operation': operation,
+            'Calls': len(op_calls),
+            'Failed': sum(1 for call in op_calls if not call.get('ok', True)),
+            'p50 ms': _percentile(ms, 0.5),
+            'p90 ms': _percentile(ms, 0.9),
+            'p95 ms': _percentile(ms, 0.95),
+            'p99 ms': _percentile(ms, 0.99),
+            'Max ms': ms[-1],
+            'Median rows': _percentile(counts, 0.5) if counts else None,
+            'Bytes written': sum(written) if written else None
+        })
+    return sorted(rows, key=lambda row: row['p95 ms'], reverse=True)
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from storage import LEDGER_COLUMNS
+
+# Typed ledger schema: dates as datetime64, repeated strings as categoricals,
+# nearly unique strings (invoice numbers) as plain strings, and counts and
+# prices as nullable numbers (blank on issues, not None in an object column)
+DATE_COLUMN = 'Date'
+CATEGORY_COLUMNS = ['Type', 'Item Name', 'Department', 'Vendor Name']
+STRING_COLUMNS = ['Invoice Number']
+INTEGER_COLUMNS = ['Quantity Issued', 'Current Stock']
+FLOAT_COLUMNS = ['Total Price']
+
+# Convert a ledger frame, however it was read or built, to the typed schema
+def normalize_ledger(ledger_df):
+    df = ledger_df.reindex(columns=LEDGER_COLUMNS)
+    typed = {DATE_COLUMN: pd.to_datetime(df[DATE_COLUMN], errors='coerce', format='mixed').astype('datetime64[ns]')}
+    for col in CATEGORY_COLUMNS:
+        values = df[col].astype(object)
+        typed[col] = values.where(values.isna(), values.astype(str)).astype('category')
+    for col in STRING_COLUMNS:
+        values = df[col].astype(object)
+        typed[col] = pd.Series(values.where(values.isna(), values.astype(str)).where(values.notna(), None), dtype=object)
+    for col in INTEGER_COLUMNS:
+        typed[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+    for col in FLOAT_COLUMNS:
+        typed[col] = pd.to_numeric(df[col], errors='coerce').astype('Float64')
+    return pd.DataFrame(typed, columns=LEDGER_COLUMNS)
+
+
+# Append-friendly columnar ledger. Columns live in pre-allocated arrays that
+# double when full, and each categorical column keeps one growing dictionary
+# of values (and its categories Index, rebuilt only when a value is added), so
+# appending k entries costs O(k) instead of copying the ledger.
+# Rows are never rewritten, so every frame() handed out stays valid.
+class LedgerBuffer:
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.capacity = capacity
+        self.dates = np.empty(capacity, dtype='datetime64[ns]')
+        self.codes = {col: np.empty(capacity, dtype=np.int32) for col in CATEGORY_COLUMNS}
+        self.categories = {col: [] for col in CATEGORY_COLUMNS}
+        self._category_codes = {col: {} for col in CATEGORY_COLUMNS}
+        # Index over each column's categories for frame(), rebuilt only after new values
+        self._category_index = dict.fromkeys(CATEGORY_COLUMNS)
+        self.strings = {col: np.empty(capacity, dtype=object) for col in STRING_COLUMNS}
+        self.numbers = {col: np.empty(capacity, dtype=np.int64) for col in INTEGER_COLUMNS}
+        self.numbers.update({col: np.empty(capacity, dtype=np.float64) for col in FLOAT_COLUMNS})
+        self.missing = {col: np.empty(capacity, dtype=bool) for col in INTEGER_COLUMNS + FLOAT_COLUMNS}
+
+    @classmethod
+    def from_frame(cls, ledger_df):
+        buffer = cls(capacity=max(1024, 1 << int(len(ledger_df)).bit_length()))
+        buffer.append_frame(ledger_df)
+        return buffer
+
+    def _reserve(self, size):
+        if size <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < size:
+            capacity *= 2
+
+        def grow(array):
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            return grown
+
+        self.dates = grow(self.dates)
+        self.codes = {col: grow(array) for col, array in self.codes.items()}
+        self.strings = {col: grow(array) for col, array in self.strings.items()}
+        self.numbers = {col: grow(array) for col, array in self.numbers.items()}
+        self.missing = {col: grow(array) for col, array in self.missing.items()}
+        self.capacity = capacity
+
+    def _code(self, col, value):
+        codes = self._category_codes[col]
+        if value not in codes:
+            codes[value] = len(self.categories[col])
+            self.categories[col].append(value)
+            self._category_index[col] = None
+        return codes[value]
+
+    # Append ledger entries (a list of dicts). Values are converted one by one:
+    # for the few entries of a commit that is far cheaper than normalizing a frame.
+    def append(self, entries):
+        start, stop = self.size, self.size + len(entries)
+        self._reserve(stop)
+        for row, entry in enumerate(entries, start):
+            date = pd.to_datetime(entry.get(DATE_COLUMN), errors='coerce', format='mixed')
+            self.dates[row] = np.datetime64('NaT') if pd.isna(date) else date.to_datetime64()
+            for col in CATEGORY_COLUMNS:
+                value = entry.get(col)
+                self.codes[col][row] = -1 if value is None or pd.isna(value) else self._code(col, str(value))
+            for col in STRING_COLUMNS:
+                value = entry.get(col)
+                self.strings[col][row] = None if value is None or pd.isna(value) else str(value)
+            for col in INTEGER_COLUMNS + FLOAT_COLUMNS:
+                value = pd.to_numeric(entry.get(col), errors='coerce')
+                missing = value is None or pd.isna(value)
+                self.missing[col][row] = missing
+                self.numbers[col][row] = 0 if missing else (round(value) if col in INTEGER_COLUMNS else value)
+        self.size = stop
+
+    # Append the rows of a ledger frame, normalizing them first
+    def append_frame(self, ledger_df):
+        df = normalize_ledger(ledger_df)
+        start, stop = self.size, self.size + len(df)
+        self._reserve(stop)
+        self.dates[start:stop] = df[DATE_COLUMN].to_numpy()
+        for col in CATEGORY_COLUMNS:
+            values = df[col].cat
+            # Map this frame's category codes onto ours; the extra -1 keeps blanks blank
+            mapping = np.array([self._code(col, value) for value in values.categories] + [-1], dtype=np.int32)
+            self.codes[col][start:stop] = mapping[values.codes.to_numpy()]
+        for col in STRING_COLUMNS:
+            self.strings[col][start:stop] = df[col].to_numpy(dtype=object)
+        for col in INTEGER_COLUMNS + FLOAT_COLUMNS:
+            values = df[col].array
+            self.missing[col][start:stop] = values.isna()
+            self.numbers[col][start:stop] = values.to_numpy(dtype=self.numbers[col].dtype, na_value=0)
+        self.size = stop
+
+    # The rows appended so far as plain numpy arrays, strings as unicode arrays
+    # (with a mask for blanks), so they can be saved without pickling
+    def to_arrays(self):
+        n = self.size
+        arrays = {'dates': self.dates[:n]}
+        for col in CATEGORY_COLUMNS:
+            arrays[f'codes.{col}'] = self.codes[col][:n]
+            arrays[f'categories.{col}'] = np.array(self.categories[col], dtype=str)
+        for col in STRING_COLUMNS:
+            values = self.strings[col][:n]
+            blank = np.equal(values, None)
+            arrays[f'blank.{col}'] = blank
+            arrays[f'strings.{col}'] = np.where(blank, '', values).astype(str)
+        for col in INTEGER_COLUMNS + FLOAT_COLUMNS:
+            arrays[f'numbers.{col}'] = self.numbers[col][:n]
+            arrays[f'missing.{col}'] = self.missing[col][:n]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        n = len(arrays['dates'])
+        buffer = cls(capacity=max(1024, 1 << n.bit_length()))
+        buffer.dates[:n] = arrays['dates']
+        for col in CATEGORY_COLUMNS:
+            buffer.codes[col][:n] = arrays[f'codes.{col}']
+            buffer.categories[col] = arrays[f'categories.{col}'].tolist()
+            buffer._category_codes[col] = {value: code for code, value in enumerate(buffer.categories[col])}
+        for col in STRING_COLUMNS:
+            strings = arrays[f'strings.{col}'].astype(object)
+            strings[arrays[f'blank.{col}']] = None
+            buffer.strings[col][:n] = strings
+        for col in INTEGER_COLUMNS + FLOAT_COLUMNS:
+            buffer.numbers[col][:n] = arrays[f'numbers.{col}']
+            buffer.missing[col][:n] = arrays[f'missing.{col}']
+        buffer.size = n
+        return buffer
+
+    # Typed DataFrame over the rows appended so far, sharing the buffer's memory
+    def frame(self):
+        n = self.size
+        data = {DATE_COLUMN: self.dates[:n]}
+        for col in CATEGORY_COLUMNS:
+            if self._category_index[col] is None:
+                self._category_index[col] = pd.Index(self.categories[col])
+            data[col] = pd.Categorical.from_codes(self.codes[col][:n], categories=self._category_index[col], validate=False)
+        for col in STRING_COLUMNS:
+            # An explicit object dtype keeps pandas from converting (copying) the strings
+            data[col] = pd.Series(self.strings[col][:n], dtype=object, copy=False)
+        for col in INTEGER_COLUMNS:
+            data[col] = pd.arrays.IntegerArray(self.numbers[col][:n], self.missing[col][:n])
+        for col in FLOAT_COLUMNS:
+            data[col] = pd.arrays.FloatingArray(self.numbers[col][:n], self.missing[col][:n])
+        return pd.DataFrame(data, columns=LEDGER_COLUMNS, copy=False)
@@ -0,0 +1,756 @@
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import math
+import os
+import sqlite3
+import threading
+import zipfile
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from balance import (
+    HOLDING_COLUMNS, OVERVIEW_BASE_COLUMNS, add_overview, compute_overview, empty_overview, overview_departments,
+    overview_from_holdings, overview_holdings
+)
+from metrics import instrument
+
+LEDGER_COLUMNS = [
+    'Date', 'Type', 'Item Name', 'Department', 'Quantity Issued', 'Current Stock',
+    'Vendor Name', 'Invoice Number', 'Total Price'
+]
+LEDGER_SHEET = 'Ledger'
+OVERVIEW_SHEET = 'Overview'
+DEPARTMENTS_SHEET = 'Departments'
+# The department register: every department ever added, in order, and whether it is archived
+DEPARTMENT_COLUMNS = ['Department', 'Archived']
+
+# Backend used when none is given; override with the INVENTORY_STORE environment variable
+DEFAULT_BACKEND = 'journal'
+# Register of the named stores; override with the INVENTORY_STORES environment variable
+STORE_REGISTER = os.environ.get('INVENTORY_STORES', 'stores.json')
+# Rows converted to cell values at a time when writing a workbook
+EXPORT_CHUNK_SIZE = 10_000
+
+# Turn numpy/pandas scalars into plain Python values that json and sqlite accept
+def _plain_value(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d")
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def _plain_record(entry):
+    return {col: _plain_value(entry.get(col)) for col in LEDGER_COLUMNS}
+
+def _empty_ledger():
+    return pd.DataFrame(columns=LEDGER_COLUMNS)
+
+# Overview from stored holdings, with a column for each department that holds anything
+def _holdings_overview(holdings):
+    departments = [d for d in pd.unique(holdings['Department']) if d != 'Admin']
+    return overview_from_holdings(holdings, departments)
+
+# Overviews written before they were stored by (item, department) are one JSON table
+def _read_overview_json(snapshot):
+    if 'holdings' in snapshot:
+        return _holdings_overview(pd.DataFrame(snapshot['holdings'], columns=HOLDING_COLUMNS))
+    return pd.DataFrame(snapshot['data'], columns=snapshot['columns'])
+
+def _overview_json(overview_df):
+    return {'holdings': [[_plain_value(v) for v in row] for row in overview_holdings(overview_df).itertuples(index=False)]}
+
+# Cut a torn last line (left by a crash mid-append) off a line-delimited file,
+# so the next append starts on a line of its own instead of being merged into
+# the fragment and skipped as torn along with it
+def _repair_tail(path, block_size=4096):
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                break
+            position = start
+        else:
+            f.truncate(0)
+        f.flush()
+        os.fsync(f.fileno())
+
+# Hold an exclusive lock on lock_path (created if needed) for the block,
+# waiting while another process holds it
+@contextlib.contextmanager
+def _exclusive(lock_path):
+    with open(lock_path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield
+
+# Offset of the start of line `count` (0-based) of a file open in binary mode,
+# found by counting newlines without parsing anything; None if it has fewer lines
+def _line_offset(f, count, block_size=1 << 20):
+    offset = 0
+    while count:
+        block = f.read(block_size)
+        if not block:
+            return None
+        newlines = block.count(b'\n')
+        if newlines < count:
+            count -= newlines
+            offset += len(block)
+            continue
+        at = -1
+        for _ in range(count):
+            at = block.index(b'\n', at + 1)
+        return offset + at + 1
+    return offset
+
+# Write a file next to the target and swap it in, so readers never see half a file
+def _atomic_write(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# Cheap change marker for a set of files: modification time and size of each
+def _file_stamp(*paths):
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+# Ledger kept as a line-delimited JSON journal, one entry per line. The
+# overview (as holdings by item and department) and the department register
+# are small JSON files next to it. Several processes may append to the
+# journal (the app's writer and the CLI, say), so writes to it hold a lock on
+# a file next to it.
+class JournalStore:
+    def __init__(self, base_name):
+        self.base_name = base_name
+        self.ledger_path = base_name + '.ledger.jsonl'
+        self.lock_path = base_name + '.ledger.lock'
+        self.overview_path = base_name + '.overview.json'
+        self.departments_path = base_name + '.departments.json'
+
+    def exists(self):
+        return os.path.exists(self.ledger_path)
+
+    def stamp(self):
+        return _file_stamp(self.ledger_path, self.overview_path, self.departments_path)
+
+    def read_ledger(self):
+        if not self.exists():
+            return _empty_ledger()
+        records = []
+        with open(self.ledger_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A torn last line from a crash mid-append; the entry was never
+                    # acknowledged, and the next append cuts it off (_repair_tail)
+                    continue
+        return pd.DataFrame(records, columns=LEDGER_COLUMNS)
+
+    # The entries from position on, parsing only those; None if there are
+    # fewer than position entries
+    def read_ledger_from(self, position):
+        if not self.exists():
+            return None if position else _empty_ledger()
+        records = []
+        with open(self.ledger_path, 'rb') as f:
+            offset = _line_offset(f, position)
+            if offset is None:
+                return None
+            f.seek(offset)
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return pd.DataFrame(records, columns=LEDGER_COLUMNS)
+
+    # The ledger as a sequence of frames of up to chunk_size entries
+    def read_ledger_chunks(self, chunk_size):
+        if not self.exists():
+            return
+        records = []
+        with open(self.ledger_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+                if len(records) == chunk_size:
+                    yield pd.DataFrame(records, columns=LEDGER_COLUMNS)
+                    records = []
+        if records:
+            yield pd.DataFrame(records, columns=LEDGER_COLUMNS)
+
+    # Without the lock, one process's tail repair could cut off another's
+    # append while it is being written
+    def append(self, entries):
+        lines = ''.join(json.dumps(_plain_record(entry)) + '\n' for entry in entries)
+        with _exclusive(self.lock_path):
+            _repair_tail(self.ledger_path)
+            with open(self.ledger_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def write_ledger(self, ledger_df):
+        records = ledger_df.reindex(columns=LEDGER_COLUMNS).to_dict('records')
+        text = ''.join(json.dumps(_plain_record(r)) + '\n' for r in records)
+        with _exclusive(self.lock_path):
+            _atomic_write(self.ledger_path, text)
+
+    def read_overview(self):
+        if not os.path.exists(self.overview_path):
+            return None
+        with open(self.overview_path, encoding='utf-8') as f:
+            return _read_overview_json(json.load(f))
+
+    def write_overview(self, overview_df):
+        _atomic_write(self.overview_path, json.dumps(_overview_json(overview_df)))
+
+    def read_departments(self):
+        if not os.path.exists(self.departments_path):
+            return None
+        with open(self.departments_path, encoding='utf-8') as f:
+            return pd.DataFrame(json.load(f), columns=DEPARTMENT_COLUMNS)
+
+    def write_departments(self, departments_df):
+        records = [[str(name), bool(archived)] for name, archived in departments_df[DEPARTMENT_COLUMNS].itertuples(index=False)]
+        _atomic_write(self.departments_path, json.dumps(records))
+
+    def delete(self):
+        for path in (self.ledger_path, self.overview_path, self.departments_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# Ledger kept in an SQLite database, one row per entry in insertion order
+class SqliteStore:
+    def __init__(self, base_name):
+        self.base_name = base_name
+        self.path = base_name + '.db'
+
+    # One connection per call, committed on success and always closed
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                columns = ', '.join(f'"{col}"' for col in LEDGER_COLUMNS)
+                conn.execute(f'CREATE TABLE IF NOT EXISTS ledger (seq INTEGER PRIMARY KEY, {columns})')
+                yield conn
+        finally:
+            conn.close()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def stamp(self):
+        return _file_stamp(self.path)
+
+    def read_ledger(self):
+        if not self.exists():
+            return _empty_ledger()
+        columns = ', '.join(f'"{col}"' for col in LEDGER_COLUMNS)
+        with self._connect() as conn:
+            return pd.read_sql_query(f'SELECT {columns} FROM ledger ORDER BY seq', conn)
+
+    def read_ledger_from(self, position):
+        if not self.exists():
+            return None if position else _empty_ledger()
+        columns = ', '.join(f'"{col}"' for col in LEDGER_COLUMNS)
+        with self._connect() as conn:
+            if conn.execute('SELECT COUNT(*) FROM ledger').fetchone()[0] < position:
+                return None
+            return pd.read_sql_query(f'SELECT {columns} FROM ledger ORDER BY seq LIMIT -1 OFFSET ?', conn, params=(position,))
+
+    def read_ledger_chunks(self, chunk_size):
+        if not self.exists():
+            return
+        columns = ', '.join(f'"{col}"' for col in LEDGER_COLUMNS)
+        with self._connect() as conn:
+            yield from pd.read_sql_query(f'SELECT {columns} FROM ledger ORDER BY seq', conn, chunksize=chunk_size)
+
+    def _insert(self, conn, entries):
+        columns = ', '.join(f'"{col}"' for col in LEDGER_COLUMNS)
+        placeholders = ', '.join('?' for _ in LEDGER_COLUMNS)
+        rows = [tuple(_plain_record(entry).values()) for entry in entries]
+        conn.executemany(f'INSERT INTO ledger ({columns}) VALUES ({placeholders})', rows)
+
+    def append(self, entries):
+        with self._connect() as conn:
+            self._insert(conn, entries)
+
+    def write_ledger(self, ledger_df):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM ledger')
+            self._insert(conn, ledger_df.reindex(columns=LEDGER_COLUMNS).to_dict('records'))
+
+    def _has_table(self, conn, name):
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    # The overview is stored as holdings, one row per (item, department);
+    # stores written before that have a wide 'overview' table instead
+    def read_overview(self):
+        if not self.exists():
+            return None
+        with self._connect() as conn:
+            if self._has_table(conn, 'holdings'):
+                columns = ', '.join(f'"{col}"' for col in HOLDING_COLUMNS)
+                return _holdings_overview(pd.read_sql_query(f'SELECT {columns} FROM holdings ORDER BY seq', conn))
+            if self._has_table(conn, 'overview'):
+                return pd.read_sql_query('SELECT * FROM overview', conn)
+            return None
+
+    def write_overview(self, overview_df):
+        holdings = overview_holdings(overview_df)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS holdings (seq INTEGER PRIMARY KEY, "Item Name", "Type", "Department", "Quantity", '
+                'UNIQUE ("Item Name", "Department"))'
+            )
+            conn.execute('DELETE FROM holdings')
+            conn.executemany(
+                'INSERT INTO holdings ("Item Name", "Type", "Department", "Quantity") VALUES (?, ?, ?, ?)',
+                [tuple(_plain_value(v) for v in row) for row in holdings.itertuples(index=False)]
+            )
+            conn.execute('DROP TABLE IF EXISTS overview')
+
+    def read_departments(self):
+        if not self.exists():
+            return None
+        with self._connect() as conn:
+            if not self._has_table(conn, 'departments'):
+                return None
+            departments = pd.read_sql_query('SELECT name, archived FROM departments ORDER BY seq', conn)
+        departments.columns = DEPARTMENT_COLUMNS
+        departments['Archived'] = departments['Archived'].astype(bool)
+        return departments
+
+    def write_departments(self, departments_df):
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS departments (seq INTEGER PRIMARY KEY, name TEXT UNIQUE, archived INTEGER)')
+            conn.execute('DELETE FROM departments')
+            conn.executemany(
+                'INSERT INTO departments (name, archived) VALUES (?, ?)',
+                [(str(name), int(bool(archived))) for name, archived in departments_df[DEPARTMENT_COLUMNS].itertuples(index=False)]
+            )
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# The old layout: one Inventory.xlsx workbook with Ledger, Overview and
+# Departments sheets, rewritten on every save. Appends update the Overview
+# sheet people read along with the Ledger sheet.
+class ExcelStore:
+    def __init__(self, base_name):
+        self.base_name = base_name
+        self.path = base_name + '.xlsx'
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def stamp(self):
+        return _file_stamp(self.path)
+
+    def _read_sheet(self, sheet_name):
+        try:
+            return pd.read_excel(self.path, sheet_name=sheet_name, engine='openpyxl')
+        except ValueError:
+            return None
+
+    def _write_sheet(self, df, sheet_name):
+        self._write_sheets({sheet_name: df})
+
+    # Replace several sheets in one write of the workbook
+    def _write_sheets(self, sheets):
+        if not self.exists():
+            writer = pd.ExcelWriter(self.path, engine='openpyxl', mode='w')
+        else:
+            writer = pd.ExcelWriter(self.path, engine='openpyxl', mode='a', if_sheet_exists='replace')
+        with writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+    def read_ledger(self):
+        if not self.exists():
+            return _empty_ledger()
+        ledger = self._read_sheet(LEDGER_SHEET)
+        return _empty_ledger() if ledger is None else ledger
+
+    # A workbook sheet can only be parsed whole
+    def read_ledger_from(self, position):
+        ledger = self.read_ledger()
+        return None if len(ledger) < position else ledger.iloc[position:].reset_index(drop=True)
+
+    # A workbook sheet can only be parsed whole, so this is a single chunk
+    def read_ledger_chunks(self, chunk_size):
+        if self.exists():
+            yield self.read_ledger()
+
+    # The new entries' overview is added to the stored one, for every
+    # registered department, archived ones included
+    def append(self, entries):
+        new = pd.DataFrame(entries)
+        ledger = pd.concat([self.read_ledger(), new], ignore_index=True)
+        overview = self.read_overview()
+        registered = self.read_departments()
+        departments = [] if overview is None else overview_departments(overview)
+        if registered is not None:
+            departments += [name for name in registered['Department'] if name not in departments]
+        overview = empty_overview(departments) if overview is None else overview
+        overview = overview.reindex(columns=OVERVIEW_BASE_COLUMNS + departments, fill_value=0)
+        overview = add_overview(overview, compute_overview(new, departments), departments)
+        self._write_sheets({LEDGER_SHEET: ledger, OVERVIEW_SHEET: overview})
+
+    def write_ledger(self, ledger_df):
+        self._write_sheet(ledger_df, LEDGER_SHEET)
+
+    def read_overview(self):
+        if not self.exists():
+            return None
+        return self._read_sheet(OVERVIEW_SHEET)
+
+    def write_overview(self, overview_df):
+        self._write_sheet(overview_df, OVERVIEW_SHEET)
+
+    def read_departments(self):
+        if not self.exists():
+            return None
+        departments = self._read_sheet(DEPARTMENTS_SHEET)
+        if departments is None:
+            return None
+        departments['Department'] = departments['Department'].astype(str)
+        departments['Archived'] = departments['Archived'].astype(bool)
+        return departments
+
+    def write_departments(self, departments_df):
+        self._write_sheet(departments_df[DEPARTMENT_COLUMNS], DEPARTMENTS_SHEET)
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Materialized overviews at given ledger positions, one JSON file per
+# checkpoint in a directory next to the store. The file name carries the
+# position and the latest entry date covered, so listing needs no parsing.
+# Next to them the typed ledger as of the latest checkpoint is kept as numpy
+# arrays (see LedgerBuffer.to_arrays), so a cold start only parses the entries after it.
+class CheckpointStore:
+    def __init__(self, base_name):
+        self.directory = base_name + '.checkpoints'
+        self.ledger_path = os.path.join(self.directory, 'ledger.npz')
+
+    # (position, date) of every checkpoint, oldest first
+    def list(self):
+        if not os.path.isdir(self.directory):
+            return []
+        checkpoints = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.json'):
+                position, date = file_name[:-len('.json')].split('_', 1)
+                checkpoints.append((int(position), date))
+        return sorted(checkpoints)
+
+    def _path(self, position, date):
+        return os.path.join(self.directory, f'{position:010d}_{date}.json')
+
+    # The checkpoint's position, date, fingerprint, overview and the departments it had
+    def read(self, position, date):
+        with open(self._path(position, date), encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if 'holdings' in checkpoint:
+            holdings = pd.DataFrame(checkpoint.pop('holdings'), columns=HOLDING_COLUMNS)
+            checkpoint['overview'] = overview_from_holdings(holdings, checkpoint['departments'])
+        else:
+            checkpoint['overview'] = pd.DataFrame(checkpoint.pop('data'), columns=checkpoint.pop('columns'))
+            checkpoint['departments'] = overview_departments(checkpoint['overview'])
+        return checkpoint
+
+    def write(self, position, date, fingerprint, overview_df):
+        os.makedirs(self.directory, exist_ok=True)
+        checkpoint = {
+            'position': position,
+            'date': date,
+            'fingerprint': fingerprint,
+            'departments': overview_departments(overview_df),
+            **_overview_json(overview_df)
+        }
+        _atomic_write(self._path(position, date), json.dumps(checkpoint))
+
+    # The saved ledger arrays, or None if there are none (or they cannot be read)
+    def read_ledger(self):
+        if not os.path.exists(self.ledger_path):
+            return None
+        try:
+            with np.load(self.ledger_path, allow_pickle=False) as saved:
+                return {name: saved[name] for name in saved.files}
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return None
+
+    def write_ledger(self, arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.ledger_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.ledger_path)
+
+    def clear(self):
+        for position, date in self.list():
+            os.remove(self._path(position, date))
+        if os.path.exists(self.ledger_path):
+            os.remove(self.ledger_path)
+        if os.path.isdir(self.directory):
+            os.rmdir(self.directory)
+
+
+# The named stores (one per campus) in the order they were added, kept in one
+# JSON file next to them. Every store has its own files under its own name.
+class StoreRegister:
+    def __init__(self, path=STORE_REGISTER):
+        self.path = path
+
+    # Store names, or None if no register was written yet
+    def read(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)['stores']
+
+    def write(self, names):
+        _atomic_write(self.path, json.dumps({'stores': list(names)}))
+
+
+# Take an exclusive lock on an open file without waiting; False if another
+# process holds it. The OS drops the lock when the holder exits or crashes.
+def _try_lock(f):
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+# Ledger entries committed in memory but not yet written to the store, one
+# JSON line per commit with the ledger position it was committed at, fsynced
+# before the commit returns. Only the process holding the log's lock file
+# writes or replays it, so two processes never flush the same entries.
+class WriteAheadLog:
+    def __init__(self, base_name):
+        self.path = base_name + '.wal.jsonl'
+        self.lock_path = base_name + '.wal.lock'
+        self._lock_file = None
+
+    # Become the log's owner; False if another live process owns it
+    def acquire(self):
+        if self._lock_file is None:
+            f = open(self.lock_path, 'a+b')
+            if not _try_lock(f):
+                f.close()
+                return False
+            self._lock_file = f
+        return True
+
+    def release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def append(self, position, entries):
+        line = json.dumps({'position': position, 'entries': [_plain_record(entry) for entry in entries]}) + '\n'
+        _repair_tail(self.path)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # (position, entries) of every logged commit, oldest first
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        batches = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    batch = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-commit; that commit was never
+                    # acknowledged, and the next append cuts it off (_repair_tail)
+                    continue
+                batches.append((batch['position'], batch['entries']))
+        return batches
+
+    # Replace the log with the given (position, entries) batches
+    def write(self, batches):
+        if not batches:
+            self.clear()
+            return
+        lines = [json.dumps({'position': position, 'entries': [_plain_record(e) for e in entries]}) for position, entries in batches]
+        _atomic_write(self.path, '\n'.join(lines) + '\n')
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Identifies the ledger prefix a checkpoint was taken from: a digest of its last entry
+def ledger_fingerprint(ledger_df, position):
+    if position == 0:
+        return ''
+    record = _plain_record(ledger_df.iloc[position - 1].to_dict())
+    # Columns holding blanks come back from disk as floats; 6 and 6.0 are the same entry,
+    # and a workbook reads an empty string back as an empty cell
+    record = {col: int(v) if isinstance(v, float) and v.is_integer() else v for col, v in record.items()}
+    record = {col: None if v == '' else v for col, v in record.items()}
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+BACKENDS = {
+    'journal': JournalStore,
+    'sqlite': SqliteStore,
+    'excel': ExcelStore,
+}
+
+# Open the store for base_name (e.g. 'Inventory'). The first time a non-Excel
+# store is opened next to an existing Inventory.xlsx, the workbook is imported.
+# With metrics on (metrics.py) its reads and writes are timed.
+def open_store(base_name, backend=None):
+    backend = backend or os.environ.get('INVENTORY_STORE', DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+    store = BACKENDS[backend](base_name)
+    legacy = ExcelStore(base_name)
+    if backend != 'excel' and not store.exists() and legacy.exists():
+        store.write_ledger(legacy.read_ledger())
+        overview = legacy.read_overview()
+        if overview is not None:
+            store.write_overview(overview)
+        departments = legacy.read_departments()
+        if departments is not None:
+            store.write_departments(departments)
+    return instrument(store)
+
+# Cell values for a chunk of ledger or overview rows: dates as dates (shown as
+# YYYY-MM-DD), blanks as empty cells
+def _cell_rows(frame):
+    values = frame.astype(object).where(frame.notna(), None)
+    if 'Date' in frame.columns and pd.api.types.is_datetime64_any_dtype(frame['Date']):
+        values['Date'] = frame['Date'].dt.date.astype(object).where(frame['Date'].notna(), None)
+    return values.itertuples(index=False, name=None)
+
+def _append_rows(sheet, frame, positions, chunk_size):
+    sheet.append(list(frame.columns))
+    count = len(frame) if positions is None else len(positions)
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        chunk = frame.iloc[start:stop] if positions is None else frame.iloc[positions[start:stop]]
+        for row in _cell_rows(chunk):
+            sheet.append(row)
+
+# Write the Inventory.xlsx workbook without holding it in memory: openpyxl's
+# write-only mode streams rows to disk as they are appended, and the frames are
+# converted to cell values chunk by chunk. positions, if given, selects the
+# ledger rows to write.
+def write_workbook(target, ledger_df, overview_df, positions=None, chunk_size=EXPORT_CHUNK_SIZE):
+    workbook = Workbook(write_only=True)
+    _append_rows(workbook.create_sheet(LEDGER_SHEET), ledger_df, positions, chunk_size)
+    _append_rows(workbook.create_sheet(OVERVIEW_SHEET), overview_df, None, chunk_size)
+    workbook.save(target)
+
+# Build the Inventory.xlsx workbook from the current ledger and overview.
+# Writes to target if given, otherwise returns the workbook as bytes.
+def export_workbook(ledger_df, overview_df, target=None):
+    buffer = target if target is not None else io.BytesIO()
+    write_workbook(buffer, ledger_df, overview_df)
+    if target is None:
+        return buffer.getvalue()
+
+
+# Finished workbook exports kept in a directory next to the store, one file per
+# key (the filters and the store's change stamp), so downloading the same export
+# again is a file read until the data changes. The most recently used few are kept.
+class ExportCache:
+    KEEP = 8
+
+    def __init__(self, base_name):
+        self.directory = base_name + '.exports'
+
+    def _path(self, key):
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.xlsx')
+
+    # Path of the export for key, calling write(path) to create it first if it is not cached
+    def get(self, key, write):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        write(tmp_path)
+        os.replace(tmp_path, path)
+        self._prune()
+        return path
+
+    def _prune(self):
+        paths = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.xlsx')]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.KEEP:]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.directory, file_name))
+        with contextlib.suppress(OSError):
+            os.rmdir(self.directory)
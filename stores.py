@@ -0,0 +1,160 @@
+import os
+import threading
+import uuid
+from inventory_service import STORE_NAME, InventoryService
+
+# Several named stores (one per campus), each an independent inventory with its
+# own ledger, overview, departments and files, so work on one store never reads
+# or rewrites another's. Stock moves between stores with transfers, and the
+# combined views are built from each store's maintained aggregates (overview
+# and monthly rollup) rather than by replaying the ledgers.
+
+# A transfer is two receipts sharing an Invoice Number: a negative one in the
+# source store and a positive one in the destination, with these vendor names
+TRANSFER_TO = 'Transfer to '
+TRANSFER_FROM = 'Transfer from '
+TRANSFER_PREFIX = 'TR-'
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+# Store names, in the order they were added; the default store when none was registered
+def store_names():
+    from storage import StoreRegister
+    names = StoreRegister().read()
+    return [STORE_NAME] if names is None else names
+
+# Register a new, empty store. Names become file names, so path separators are refused.
+def add_store(name):
+    from storage import StoreRegister
+    name = name.strip()
+    names = store_names()
+    if not name or name != os.path.basename(name) or name.startswith('.'):
+        raise ValueError(f"'{name}' cannot be used as a store name")
+    if name.casefold() in (existing.casefold() for existing in names):
+        raise ValueError(f"Store '{name}' already exists")
+    StoreRegister().write(names + [name])
+    return name
+
+# The InventoryService of a store, shared by every caller in this process
+def service(name=STORE_NAME, backend=None):
+    with _services_lock:
+        key = (name, backend)
+        if key not in _services:
+            _services[key] = InventoryService(name, backend=backend)
+        return _services[key]
+
+
+# Move stock of an item from the Admin stock of one store to another. The
+# source is committed first, so a refused transfer (StockError) changes
+# nothing; the destination records the item under its own spelling of the
+# name. If the process stops in between, complete_transfers() finishes it.
+# Returns the transfer reference.
+def transfer(source, destination, date, item_name, quantity, backend=None):
+    if source == destination:
+        raise ValueError("A transfer needs two different stores")
+    unknown = [name for name in (source, destination) if name not in store_names()]
+    if unknown:
+        raise ValueError(f"Unknown store '{unknown[0]}'")
+    if quantity <= 0:
+        raise ValueError("The quantity to transfer must be positive")
+    from balance import ADMIN
+    from datastore import StockError
+    source_service = service(source, backend)
+    item = source_service.match_item(item_name)
+    if item is None:
+        raise StockError(item_name, 0)
+    item_type = source_service.catalogue().item_type(item)
+    reference = TRANSFER_PREFIX + uuid.uuid4().hex[:12]
+    source_service.add_transaction(date, item_type, item, ADMIN, -quantity, TRANSFER_TO + destination, reference)
+    service(destination, backend).add_transaction(date, item_type, item, ADMIN, quantity, TRANSFER_FROM + source, reference)
+    return reference
+
+# Receipts in a store's ledger whose vendor name starts with prefix, found through its ledger index
+def _transfer_entries(store_service, prefix):
+    snapshot = store_service.snapshot()
+    ledger_index = store_service.ledger_index(snapshot)
+    vendors = [vendor for vendor in ledger_index.values('Vendor Name') if vendor.startswith(prefix)]
+    if not vendors:
+        return snapshot.ledger.iloc[:0]
+    return snapshot.ledger.iloc[ledger_index.select({'Vendor Name': vendors})]
+
+# Transfers taken out of a store whose receipt is missing at the destination
+# (the process stopped between the two commits), as ledger entries of the source
+def incomplete_transfers(backend=None):
+    import pandas as pd
+    received = {}
+    missing = []
+    for name in store_names():
+        entries = _transfer_entries(service(name, backend), TRANSFER_FROM)
+        received[name] = set(entries['Invoice Number'].astype(str))
+    for name in store_names():
+        sent = _transfer_entries(service(name, backend), TRANSFER_TO)
+        destinations = sent['Vendor Name'].astype(str).str[len(TRANSFER_TO):]
+        lost = [
+            reference not in received.get(destination, ())
+            for reference, destination in zip(sent['Invoice Number'].astype(str), destinations)
+        ]
+        missing.append(sent[lost].assign(Store=name))
+    return pd.concat(missing, ignore_index=True) if missing else pd.DataFrame()
+
+# Commit the missing destination receipts of incomplete transfers; returns how many
+def complete_transfers(backend=None):
+    from balance import ADMIN
+    missing = incomplete_transfers(backend)
+    for entry in missing.to_dict('records'):
+        destination = str(entry['Vendor Name'])[len(TRANSFER_TO):]
+        date = entry['Date'].strftime('%Y-%m-%d') if hasattr(entry['Date'], 'strftime') else entry['Date']
+        service(destination, backend).add_transaction(
+            date, str(entry['Type']), str(entry['Item Name']), ADMIN, -int(entry['Quantity Issued']),
+            TRANSFER_FROM + entry['Store'], str(entry['Invoice Number'])
+        )
+    return len(missing)
+
+
+# Stock of every item across stores: a column per store with the store's
+# total, and the overall Total. Built from each store's overview; spellings of
+# one item (see catalogue.item_key) are one row, named as in the first store.
+def combined_overview(names=None, types=(), backend=None):
+    import pandas as pd
+    from catalogue import item_key
+    names = store_names() if names is None else list(names)
+    frames = []
+    for name in names:
+        overview = service(name, backend).overview()
+        if types:
+            overview = overview[overview['Type'].isin(list(types))]
+        frames.append(overview[['Item Name', 'Type', 'Total']].assign(Store=name))
+    stock = pd.concat(frames, ignore_index=True)
+    if stock.empty:
+        return pd.DataFrame(columns=['Item Name', 'Type'] + names + ['Total'])
+    stock['Key'] = [item_key(item) for item in stock['Item Name']]
+    wide = stock.pivot_table(index='Key', columns='Store', values='Total', aggfunc='sum', fill_value=0, sort=False)
+    wide = wide.reindex(columns=names, fill_value=0)
+    combined = stock.drop_duplicates('Key').set_index('Key')[['Item Name', 'Type']].join(wide)
+    combined['Total'] = combined[names].sum(axis=1)
+    combined.columns.name = None
+    return combined.reset_index(drop=True)
+
+# Per month (rows) and store (columns): a per-store monthly figure summed over
+# its columns, from each store's rollup
+def _combined_monthly(names, monthly):
+    import pandas as pd
+    names = store_names() if names is None else list(names)
+    per_store = {name: monthly(name).sum(axis=1) for name in names}
+    per_store = {name: totals for name, totals in per_store.items() if len(totals)}
+    if not per_store:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Month'), columns=names)
+    combined = pd.concat(per_store, axis=1)
+    months = pd.date_range(combined.index.min(), combined.index.max(), freq='MS', name='Month')
+    dtype = pd.concat(per_store.values()).dtype
+    return combined.reindex(index=months, columns=names).fillna(0).astype(dtype)
+
+# Quantity issued per month and store, optionally only for some item types
+def combined_usage(names=None, types=(), backend=None):
+    return _combined_monthly(names, lambda name: service(name, backend).monthly_usage(types=types))
+
+# Receipt spend per month and store, optionally only for some item types
+def combined_spend(names=None, types=(), backend=None):
+    return _combined_monthly(names, lambda name: service(name, backend).monthly_spend(types=types))
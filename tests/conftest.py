@@ -0,0 +1,48 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datastore import DataStore
+from storage import open_store
+
+
+# A ledger entry as a commit takes it. With stock it also carries the
+# Current Stock a store holds; fields override any other column.
+def entry(item, quantity=1, department='Admin', invoice='1', stock=None, **fields):
+    record = {'Date': '2024-01-01', 'Type': 'Hardware', 'Item Name': item, 'Department': department,
+              'Quantity Issued': quantity, 'Vendor Name': 'V', 'Invoice Number': invoice, 'Total Price': None}
+    if stock is not None:
+        record['Current Stock'] = stock
+    record.update(fields)
+    return record
+
+
+# A DataStore on a scratch store under path, loaded
+def open_data(path, backend=None, departments=('Sports',)):
+    data = DataStore(open_store(str(path / 'Inventory'), backend), list(departments))
+    data.snapshot()
+    return data
+
+
+# Ledger of receipts and issues over a few items with a fixed type each, one
+# entry a day. departments may name unregistered ones; with prices, entries
+# have a Total Price (some blank).
+def random_ledger(seed, rows=300, items=15, departments=('Admin', 'Admin', 'Sports', 'Canteen', 'Boys Hostel', 'Closed wing'),
+                  prices=False):
+    rng = np.random.default_rng(seed)
+    names = [f'Item {i}' for i in range(items)]
+    types = {name: rng.choice(['Hardware', 'Stationary', 'Sports equipment']) for name in names}
+    picked = rng.choice(names, rows)
+    ledger = pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=rows, freq='D').strftime('%Y-%m-%d'),
+        'Type': [types[name] for name in picked],
+        'Item Name': picked,
+        'Department': rng.choice(list(departments), rows),
+        'Quantity Issued': rng.integers(1, 20, rows)
+    })
+    if prices:
+        ledger['Total Price'] = rng.choice([np.nan, 10.0, 25.5], rows)
+    return ledger
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+from analytics import KEYS, Rollup, _group, monthly_usage
+from conftest import random_ledger
+from schema import LedgerBuffer
+
+
+def summed(rollup):
+    frame = _group(rollup.frame()).astype({col: object for col in KEYS[:3]})
+    return frame.sort_values(KEYS).reset_index(drop=True)
+
+
+# Commits of one or a few entries, through folds and merges of the recent frames
+def test_extended_rollup_matches_a_full_rollup():
+    ledger = random_ledger(0, 3000, items=50, departments=('Admin', 'Sports', 'Canteen'), prices=True)
+    buffer = LedgerBuffer.from_frame(ledger.iloc[:1000])
+    rollup = Rollup().extended(buffer.frame())
+    position = 1000
+    rng = np.random.default_rng(1)
+    while position < len(ledger):
+        step = int(rng.integers(1, 40))
+        buffer.append(ledger.iloc[position:position + step].to_dict('records'))
+        position += step
+        rollup = rollup.extended(buffer.frame())
+    full = Rollup().extended(buffer.frame())
+    pd.testing.assert_frame_equal(summed(rollup), summed(full))
+    pd.testing.assert_frame_equal(monthly_usage(rollup), monthly_usage(full))
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+from balance import apply_entry, build_index, compute_overview, empty_overview
+from conftest import random_ledger
+from schema import LedgerBuffer
+
+DEPARTMENTS = ['Sports', 'Canteen', 'Boys Hostel']
+
+
+# The original row-by-row replay (update_inventory before the vectorized
+# rebuild), kept as the reference the new code must match
+def replay_overview(ledger_df, departments):
+    inventory = pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + departments)
+    for index, row in ledger_df.iterrows():
+        if row['Item Name'] not in inventory['Item Name'].values:
+            new_row = {'Item Name': row['Item Name'], 'Type': row['Type'], 'Total': 0, 'Admin': 0}
+            for dept in departments:
+                new_row[dept] = 0
+            inventory = pd.concat([inventory, pd.DataFrame([new_row])], ignore_index=True)
+
+        item_row = inventory[inventory['Item Name'] == row['Item Name']].index[0]
+
+        if row['Department'] == 'Admin':
+            inventory.at[item_row, 'Admin'] += row['Quantity Issued']
+        elif row['Department'] in departments:
+            inventory.at[item_row, row['Department']] += row['Quantity Issued']
+            inventory.at[item_row, 'Admin'] -= row['Quantity Issued']
+
+        inventory.at[item_row, 'Total'] = inventory.at[item_row, 'Admin'] + sum(inventory.loc[item_row, departments])
+
+    return inventory
+
+
+def plain(overview):
+    overview = overview.reset_index(drop=True).astype({col: 'int64' for col in ['Total', 'Admin'] + DEPARTMENTS})
+    return overview.astype({'Item Name': object, 'Type': object})
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_compute_overview_matches_replay(seed):
+    ledger = random_ledger(seed)
+    expected = plain(replay_overview(ledger, DEPARTMENTS))
+    pd.testing.assert_frame_equal(plain(compute_overview(ledger, DEPARTMENTS)), expected)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_compute_overview_of_typed_ledger_matches_replay(seed):
+    ledger = random_ledger(seed)
+    typed = LedgerBuffer.from_frame(ledger).frame()
+    expected = plain(replay_overview(ledger, DEPARTMENTS))
+    pd.testing.assert_frame_equal(plain(compute_overview(typed, DEPARTMENTS)), expected)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('indexed', [False, True])
+def test_apply_entry_matches_replay(seed, indexed):
+    ledger = random_ledger(seed, rows=150)
+    overview = empty_overview(DEPARTMENTS)
+    index = build_index(overview) if indexed else None
+    for entry in ledger.to_dict('records'):
+        overview = apply_entry(overview, entry, DEPARTMENTS, index)
+    expected = plain(replay_overview(ledger, DEPARTMENTS))
+    pd.testing.assert_frame_equal(plain(overview), expected)
+
+
+def test_issue_debits_admin_and_total_is_recomputed():
+    ledger = pd.DataFrame({
+        'Date': ['2024-01-01'] * 4,
+        'Type': ['Hardware'] * 4,
+        'Item Name': ['Mop'] * 4,
+        'Department': ['Admin', 'Sports', 'Closed wing', 'Canteen'],
+        'Quantity Issued': [10, 3, 5, 2]
+    })
+    overview = compute_overview(ledger, DEPARTMENTS).iloc[0]
+    assert (overview['Admin'], overview['Sports'], overview['Canteen'], overview['Total']) == (5, 3, 2, 10)
@@ -0,0 +1,70 @@
+import io
+import pandas as pd
+import pytest
+from balance import build_index, compute_overview
+from bulk_import import read_batch, validate_batch
+
+DEPARTMENTS = ['Sports', 'Canteen']
+
+
+def current_stock():
+    ledger = pd.DataFrame([
+        {'Date': '2024-01-01', 'Type': 'Hardware', 'Item Name': 'Mop', 'Department': 'Admin', 'Quantity Issued': 5},
+        {'Date': '2024-01-01', 'Type': 'Hardware', 'Item Name': 'Broom', 'Department': 'Admin', 'Quantity Issued': 2}
+    ])
+    overview = compute_overview(ledger, DEPARTMENTS)
+    return overview, build_index(overview)
+
+
+def batch(text):
+    return read_batch(io.StringIO(text), 'batch.csv')
+
+
+def test_issues_are_checked_against_a_running_balance():
+    overview, index = current_stock()
+    rows = batch(
+        "Date,Type,Item Name,Department,Quantity\n"
+        "2024-02-01,Hardware,Mop,Sports,3\n"
+        "2024-02-01,Hardware,Broom,Canteen,2\n"
+        "2024-02-02,Hardware,Mop,Canteen,3\n"
+    )
+    entries, errors = validate_batch(rows, overview, index, DEPARTMENTS, receipts=False)
+    assert errors.to_dict('records') == [{'Row': 4, 'Problem': 'Not enough Mop. Available: 2'}]
+    assert [entry['Current Stock'] for entry in entries] == [2, 0, -1]
+
+    rows = batch("Date,Type,Item Name,Quantity\n2024-02-01,Hardware,Mop,4\n2024-02-01,Hardware,Bucket,1\n")
+    entries, errors = validate_batch(rows, overview, index, DEPARTMENTS, receipts=True)
+    assert errors.empty
+    assert [(entry['Department'], entry['Current Stock']) for entry in entries] == [('Admin', 9), ('Admin', 1)]
+
+
+def test_bad_rows_are_reported_by_spreadsheet_row():
+    overview, index = current_stock()
+    rows = batch(
+        "Date,Type,Item Name,Department,Quantity\n"
+        "someday,Hardware,Mop,Sports,1\n"
+        "2024-02-01,Stationary,Mop,Sports,1\n"
+        "2024-02-01,Hardware,,Sports,1\n"
+        "2024-02-01,Hardware,Broom,Library,1\n"
+        "2024-02-01,Hardware,Broom,Sports,1.5\n"
+    )
+    errors = validate_batch(rows, overview, index, DEPARTMENTS, receipts=False)[1]
+    # Each row's first problem (a row without an item is short of stock too)
+    assert errors.drop_duplicates('Row').to_dict('records') == [
+        {'Row': 2, 'Problem': 'Date is missing or not a date'},
+        {'Row': 3, 'Problem': 'Item is recorded as type Hardware'},
+        {'Row': 4, 'Problem': 'Item Name is missing'},
+        {'Row': 5, 'Problem': "Unknown department 'Library'"},
+        {'Row': 6, 'Problem': 'Quantity must be a whole number above zero'}
+    ]
+
+
+@pytest.mark.parametrize('text', ['Date,Type,Item Name,Quantity\n', 'Date,Type,Item Name,Quantity\n\n'])
+def test_a_file_without_rows_is_refused(text):
+    with pytest.raises(ValueError, match='no rows'):
+        batch(text)
+
+
+def test_a_file_without_required_columns_is_refused():
+    with pytest.raises(ValueError, match='Quantity'):
+        batch("Date,Type,Item Name\n2024-02-01,Hardware,Mop\n")
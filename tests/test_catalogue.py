@@ -0,0 +1,21 @@
+from catalogue import ItemCatalogue
+
+NAMES = ['Cricket Ball', 'Football', 'A4 Paper Ream', 'Blue Pens', 'Stapler']
+TYPES = ['Sports', 'Sports', 'Stationary', 'Stationary', 'Stationary']
+
+
+# A commit that only names catalogued items reuses the catalogue as it is
+def test_extended_without_new_names_returns_the_catalogue():
+    catalogue = ItemCatalogue().extended(NAMES, TYPES)
+    assert catalogue.extended(['Football', 'Stapler'], ['Sports', 'Stationary']) is catalogue
+    assert catalogue.extended([], []) is catalogue
+
+
+def test_extended_catalogue_matches_a_full_one():
+    catalogue = ItemCatalogue().extended(NAMES[:2], TYPES[:2]).extended(NAMES[1:], TYPES[1:]).extended(['Blue Pens'], ['Stationary'])
+    full = ItemCatalogue().extended(NAMES, TYPES)
+    assert len(catalogue) == len(full)
+    for query in ['pen', 'paper', 'ball', 'stapl']:
+        assert catalogue.search(query) == full.search(query)
+    assert catalogue.match('blue pen') == full.match('blue pen') == 'Blue Pens'
+    assert catalogue.item_type('A4 Paper Ream') == 'Stationary'
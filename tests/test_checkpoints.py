@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+import datastore
+from conftest import entry, open_data
+from schema import LedgerBuffer
+from storage import open_store
+
+BACKENDS = ['journal', 'sqlite', 'excel']
+
+
+def cold_start(path, backend):
+    data = open_data(path, backend)
+    snapshot = data.snapshot()
+    full = LedgerBuffer.from_frame(open_store(str(path / 'Inventory'), backend).read_ledger()).frame()
+    pd.testing.assert_frame_equal(snapshot.ledger, full, check_categorical=False)
+    data.close()
+    return snapshot
+
+
+# After a checkpoint only the entries appended since are parsed, and the result is the same ledger
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_cold_start_reads_the_entries_after_the_checkpoint(tmp_path, monkeypatch, backend):
+    data = open_data(tmp_path, backend)
+    data.commit([entry('Mop', 5), entry('Broom', 2)])
+    data.checkpoint()
+    data.commit([entry('Mop', 1, 'Sports')])
+    data.close()
+    # Another process appends directly
+    open_store(str(tmp_path / 'Inventory'), backend).append([entry('Bucket', 3, stock=3)])
+    if backend != 'excel':
+        monkeypatch.setattr(type(open_store(str(tmp_path / 'Inventory'), backend)), 'read_ledger', None)
+    snapshot = open_data(tmp_path, backend).snapshot()
+    assert snapshot.ledger['Item Name'].tolist() == ['Mop', 'Broom', 'Mop', 'Bucket']
+    assert snapshot.overview.set_index('Item Name')['Admin'].to_dict() == {'Mop': 4, 'Broom': 2, 'Bucket': 3}
+    monkeypatch.undo()
+    cold_start(tmp_path, backend)
+
+
+# A saved ledger the store no longer holds is not used
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_saved_ledger_of_a_replaced_store_is_ignored(tmp_path, backend):
+    data = open_data(tmp_path, backend)
+    data.commit([entry('Mop', 5), entry('Broom', 2)])
+    data.checkpoint()
+    data.close()
+    open_store(str(tmp_path / 'Inventory'), backend).write_ledger(pd.DataFrame([entry('Duster', 4), entry('Mop', 1), entry('Pail', 2)]))
+    snapshot = cold_start(tmp_path, backend)
+    assert snapshot.ledger['Item Name'].tolist() == ['Duster', 'Mop', 'Pail']
+    open_store(str(tmp_path / 'Inventory'), backend).write_ledger(pd.DataFrame([entry('Duster', 4)]))
+    assert cold_start(tmp_path, backend).ledger['Item Name'].tolist() == ['Duster']
+
+
+# A checkpoint taken while commits were still to be written covers entries
+# the store lacks after a crash; they come back from the write-ahead log
+def test_saved_ledger_ahead_of_the_store_after_a_crash(tmp_path, monkeypatch):
+    monkeypatch.setattr(datastore, 'FLUSH_DELAY', 3600)
+    data = open_data(tmp_path, 'journal')
+    data.commit([entry('Mop', 5)])
+    data.flush()
+    data.commit([entry('Broom', 2)])
+    data.checkpoint()
+    data.wal.release()
+    assert open_store(str(tmp_path / 'Inventory'), 'journal').read_ledger()['Item Name'].tolist() == ['Mop']
+    data = open_data(tmp_path, 'journal')
+    assert data.snapshot().ledger['Item Name'].tolist() == ['Mop', 'Broom']
+    data.close()
+    assert cold_start(tmp_path, 'journal').ledger['Item Name'].tolist() == ['Mop', 'Broom']
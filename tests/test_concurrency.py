@@ -0,0 +1,65 @@
+import random
+import threading
+import pandas as pd
+import pytest
+from conftest import open_data
+from datastore import StockError
+
+THREADS = 12
+COMMITS = 100
+ITEMS = ['Mop', 'Broom', 'Bucket', 'Duster']
+DEPARTMENTS = ['Sports', 'Canteen']
+
+
+# Many threads receive and issue the same few items at once; issues that ask
+# for more than Admin holds must be refused rather than drive it negative
+@pytest.mark.parametrize('backend', ['journal', 'sqlite'])
+def test_concurrent_commits_lose_nothing_and_never_go_negative(tmp_path, backend):
+    data = open_data(tmp_path, backend, DEPARTMENTS)
+    committed = []
+    lowest = []
+    errors = []
+
+    def work(seed):
+        rng = random.Random(seed)
+        done = 0
+        low = 0
+        try:
+            for _ in range(COMMITS):
+                receipt = rng.random() < 0.4
+                entry = {
+                    'Date': '2024-01-01', 'Type': 'Hardware', 'Item Name': rng.choice(ITEMS),
+                    'Department': 'Admin' if receipt else rng.choice(DEPARTMENTS),
+                    'Quantity Issued': rng.randint(1, 10), 'Vendor Name': '', 'Invoice Number': '', 'Total Price': None
+                }
+                try:
+                    snapshot = data.commit([entry])
+                except StockError:
+                    continue
+                done += 1
+                low = min(low, int(snapshot.overview['Admin'].min()))
+        except Exception as e:
+            errors.append(e)
+        committed.append(done)
+        lowest.append(low)
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    snapshot = data.snapshot()
+    assert len(snapshot.ledger) == sum(committed)
+    assert min(lowest) >= 0
+    assert (snapshot.ledger['Current Stock'] >= 0).all()
+    data.close()
+
+    reloaded = open_data(tmp_path, backend, DEPARTMENTS).snapshot()
+    assert len(reloaded.ledger) == sum(committed)
+    columns = ['Total', 'Admin'] + DEPARTMENTS
+    expected = snapshot.overview.set_index('Item Name')[columns].astype('int64').sort_index()
+    pd.testing.assert_frame_equal(
+        reloaded.overview.set_index('Item Name')[columns].astype('int64').sort_index(), expected, check_index_type=False
+    )
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+from balance import compute_overview
+from conftest import entry, open_data
+from datastore import DepartmentError
+from storage import open_store
+
+DEPARTMENTS = ['Sports', 'Canteen']
+
+
+def test_add_archive_and_bring_back(tmp_path):
+    data = open_data(tmp_path, departments=DEPARTMENTS)
+    data.commit([entry('Mop', 5), entry('Mop', 2, 'Sports')])
+    data.add_department('Arts')
+    data.archive_department('Sports')
+    snapshot = data.snapshot()
+    assert snapshot.departments == ['Canteen', 'Arts'] and snapshot.archived == ['Sports']
+    with pytest.raises(DepartmentError):
+        data.commit([entry('Mop', 1, 'Sports')])
+    # The archived department keeps its column and stock, and after a reload too
+    data.close()
+    data = open_data(tmp_path, departments=DEPARTMENTS)
+    overview = data.snapshot().overview.set_index('Item Name')
+    assert overview.loc['Mop', 'Sports'] == 2 and overview.loc['Mop', 'Total'] == 5
+    assert data.snapshot().archived == ['Sports']
+    data.add_department('Sports')
+    data.commit([entry('Mop', 1, 'Sports')])
+    assert data.snapshot().overview.set_index('Item Name').loc['Mop', 'Sports'] == 3
+    with pytest.raises(DepartmentError, match='already exists'):
+        data.add_department('Sports')
+    data.close()
+
+
+@pytest.mark.parametrize('name', ['', '   ', 'Admin', 'Total', 'Item Name', 'Type'])
+def test_blank_and_overview_column_names_are_refused(tmp_path, name):
+    data = open_data(tmp_path, departments=DEPARTMENTS)
+    data.commit([entry('Mop', 5)])
+    with pytest.raises(DepartmentError):
+        data.add_department(name)
+    snapshot = data.snapshot()
+    assert list(snapshot.overview.columns) == ['Item Name', 'Type', 'Total', 'Admin', 'Sports', 'Canteen']
+    assert snapshot.overview['Total'].tolist() == [5]
+    data.close()
+    assert open_data(tmp_path, departments=DEPARTMENTS).stored_departments() == ['Sports', 'Canteen']
+
+
+# Before the register, departments were only the overview's columns, and
+# removing one dropped its column along with the stock it held
+def test_department_dropped_under_the_old_code_comes_back_archived(tmp_path):
+    ledger = pd.DataFrame([entry('Mop', 5), entry('Mop', 2, 'Sports'), entry('Mop', 1, 'Canteen')])
+    store = open_store(str(tmp_path / 'Inventory'))
+    store.write_ledger(ledger)
+    store.write_overview(compute_overview(ledger, ['Canteen']))
+    data = open_data(tmp_path, departments=DEPARTMENTS)
+    snapshot = data.snapshot()
+    assert snapshot.departments == ['Canteen'] and snapshot.archived == ['Sports']
+    overview = snapshot.overview.set_index('Item Name')
+    assert overview.loc['Mop', 'Sports'] == 2 and overview.loc['Mop', 'Admin'] == 2 and overview.loc['Mop', 'Total'] == 5
+    assert data.stored_departments() == ['Canteen', 'Sports']
+    data.close()
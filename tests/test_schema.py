@@ -0,0 +1,19 @@
+import pandas as pd
+from conftest import entry
+from schema import LedgerBuffer, normalize_ledger
+
+
+def test_appended_entries_read_back_like_a_normalized_frame():
+    first = [entry('Mop', invoice='A1', stock=1), entry('Broom', invoice=None, stock=1)]
+    later = [entry('Mop', 3, invoice='A2', stock=3), entry('Bucket', invoice=7, stock=1)]
+    buffer = LedgerBuffer.from_frame(pd.DataFrame(first))
+    frames = [buffer.frame()]
+    for e in later:
+        buffer.append([e])
+        frames.append(buffer.frame())
+    expected = normalize_ledger(pd.DataFrame(first + later))
+    assert frames[-1].astype(object).equals(expected.astype(object))
+    assert frames[-1]['Invoice Number'].tolist() == ['A1', None, 'A2', '7']
+    # Frames handed out earlier are not changed by later appends
+    assert frames[0]['Item Name'].tolist() == ['Mop', 'Broom']
+    assert frames[1]['Invoice Number'].tolist() == ['A1', None, 'A2']
@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import pandas as pd
+import pytest
+from conftest import entry
+from storage import DEPARTMENT_COLUMNS, ExcelStore, JournalStore
+
+
+def test_torn_tail_is_skipped_on_read(tmp_path):
+    store = JournalStore(str(tmp_path / 'Inventory'))
+    store.append([entry('Mop', 1, stock=1)])
+    with open(store.ledger_path, 'a', encoding='utf-8') as f:
+        f.write('{"Date": "2024-01-0')
+    assert store.read_ledger()['Item Name'].tolist() == ['Mop']
+
+
+def test_append_after_torn_tail_keeps_the_new_entry(tmp_path):
+    store = JournalStore(str(tmp_path / 'Inventory'))
+    store.append([entry('Mop', 1, stock=1)])
+    with open(store.ledger_path, 'a', encoding='utf-8') as f:
+        f.write('{"Date": "2024-01-0')
+    store.append([entry('Broom', 2, stock=2), entry('Bucket', 3, stock=3)])
+    assert store.read_ledger()['Item Name'].tolist() == ['Mop', 'Broom', 'Bucket']
+    assert [len(chunk) for chunk in store.read_ledger_chunks(2)] == [2, 1]
+
+
+def test_append_after_torn_only_line(tmp_path):
+    store = JournalStore(str(tmp_path / 'Inventory'))
+    with open(store.ledger_path, 'w', encoding='utf-8') as f:
+        f.write('{"Date": "2024')
+    store.append([entry('Mop', 1, stock=1)])
+    assert store.read_ledger()['Item Name'].tolist() == ['Mop']
+
+
+# The workbook's Overview sheet is what people read, so appends keep it current
+def test_excel_append_updates_the_overview_sheet(tmp_path):
+    store = ExcelStore(str(tmp_path / 'Inventory'))
+    store.write_departments(pd.DataFrame([('Sports', False), ('Arts', True)], columns=DEPARTMENT_COLUMNS))
+    store.append([entry('Mop', 5, stock=5)])
+    store.append([entry('Mop', 2, 'Sports', stock=2), entry('Broom', 3, stock=3)])
+    assert store.read_ledger()['Item Name'].tolist() == ['Mop', 'Mop', 'Broom']
+    overview = store.read_overview()
+    assert overview.columns.tolist() == ['Item Name', 'Type', 'Total', 'Admin', 'Sports', 'Arts']
+    assert overview[['Item Name', 'Total', 'Admin', 'Sports']].values.tolist() == [['Mop', 5, 3, 2], ['Broom', 3, 3, 0]]
+
+
+def append_batches(base_name, worker):
+    store = JournalStore(base_name)
+    for batch in range(30):
+        store.append([entry(f'Item {worker}-{batch}', n, stock=n, **{'Vendor Name': 'V' * 200}) for n in range(50)])
+
+
+# Appends from several processes at once: a tail repair must not cut off another process's append
+@pytest.mark.skipif(os.name == 'nt', reason='needs fork')
+def test_appends_from_several_processes_are_all_kept(tmp_path):
+    base_name = str(tmp_path / 'Inventory')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=append_batches, args=(base_name, worker)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    assert len(JournalStore(base_name).read_ledger()) == 4 * 30 * 50
@@ -0,0 +1,174 @@
+import threading
+import time
+import pytest
+import datastore
+from conftest import entry, open_data
+from storage import WriteAheadLog, open_store
+
+BACKENDS = ['journal', 'sqlite']
+
+
+# Commit without the writer getting a chance to store anything, then "crash":
+# the process is gone, so its lease on the log is too. The delay stays long,
+# so later DataStores only write on close().
+def crashed_commits(path, backend, monkeypatch, *batches):
+    monkeypatch.setattr(datastore, 'FLUSH_DELAY', 3600)
+    data = open_data(path, backend)
+    for batch in batches:
+        data.commit(batch)
+    data.wal.release()
+    return data.wal.read()
+
+
+def stored_items(path, backend):
+    return open_store(str(path / 'Inventory'), backend).read_ledger()['Item Name'].tolist()
+
+
+def test_torn_log_tail_does_not_swallow_the_next_commit(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / 'Inventory'))
+    wal.append(0, [entry('Mop', 1)])
+    with open(wal.path, 'a', encoding='utf-8') as f:
+        f.write('{"position": 1, "entr')
+    wal.append(1, [entry('Broom', 2)])
+    assert [(position, [e['Item Name'] for e in entries]) for position, entries in wal.read()] == [(0, ['Mop']), (1, ['Broom'])]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_unwritten_commits_are_replayed(tmp_path, monkeypatch, backend):
+    crashed_commits(tmp_path, backend, monkeypatch, [entry('Mop', 5)], [entry('Mop', 2, 'Sports'), entry('Broom', 1)])
+    assert stored_items(tmp_path, backend) == []
+    data = open_data(tmp_path, backend)
+    assert data.snapshot().ledger['Item Name'].tolist() == ['Mop', 'Mop', 'Broom']
+    assert data.write_status().pending_entries == 3
+    data.close()
+    assert stored_items(tmp_path, backend) == ['Mop', 'Mop', 'Broom']
+    assert WriteAheadLog(str(tmp_path / 'Inventory')).read() == []
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_stored_commits_are_not_replayed(tmp_path, monkeypatch, backend):
+    # The store write finished but the log was not rewritten before the crash
+    batches = crashed_commits(tmp_path, backend, monkeypatch, [entry('Mop', 5)], [entry('Broom', 1)])
+    open_store(str(tmp_path / 'Inventory'), backend).append([e for _, entries in batches for e in entries])
+    data = open_data(tmp_path, backend)
+    assert data.snapshot().ledger['Item Name'].tolist() == ['Mop', 'Broom']
+    assert data.write_status().pending_entries == 0
+    data.close()
+    assert stored_items(tmp_path, backend) == ['Mop', 'Broom']
+
+
+def test_write_cut_short_replays_only_the_rest(tmp_path, monkeypatch):
+    # The journal write stopped after the first commit and two entries of the second
+    batches = crashed_commits(
+        tmp_path, 'journal', monkeypatch,
+        [entry('Mop', 5)], [entry('Broom', 4), entry('Bucket', 3), entry('Duster', 2)], [entry('Mop', 1, 'Sports')]
+    )
+    written = batches[0][1] + batches[1][1][:2]
+    open_store(str(tmp_path / 'Inventory'), 'journal').append(written)
+    data = open_data(tmp_path, 'journal')
+    expected = ['Mop', 'Broom', 'Bucket', 'Duster', 'Mop']
+    assert data.snapshot().ledger['Item Name'].tolist() == expected
+    assert data.write_status().pending_entries == 2
+    data.close()
+    assert stored_items(tmp_path, 'journal') == expected
+    overview = data.snapshot().overview.set_index('Item Name')
+    assert overview.loc['Mop', 'Admin'] == 4 and overview.loc['Mop', 'Sports'] == 1
+
+
+def test_entries_appended_elsewhere_before_the_write(tmp_path, monkeypatch):
+    # Another process appended directly, then our write was cut short
+    batches = crashed_commits(tmp_path, 'journal', monkeypatch, [entry('Mop', 5), entry('Broom', 4)], [entry('Bucket', 3)])
+    store = open_store(str(tmp_path / 'Inventory'), 'journal')
+    store.append([entry('Duster', 2, stock=2)])
+    store.append(batches[0][1][:1])
+    data = open_data(tmp_path, 'journal')
+    assert data.snapshot().ledger['Item Name'].tolist() == ['Duster', 'Mop', 'Broom', 'Bucket']
+    data.close()
+    assert stored_items(tmp_path, 'journal') == ['Duster', 'Mop', 'Broom', 'Bucket']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_own_register_write_while_pending_is_not_a_change_elsewhere(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(datastore, 'FLUSH_DELAY', 3600)
+    data = open_data(tmp_path, backend)
+    data.commit([entry('Mop', 5)])
+    data.flush()
+    version = data.snapshot().version
+    data.commit([entry('Broom', 3)])
+    data.add_department('Arts')
+    data.flush()
+    data.commit([entry('Mop', 1, 'Arts')], expected_version=version)
+    assert data.snapshot().ledger['Item Name'].tolist() == ['Mop', 'Broom', 'Mop']
+    data.close()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_change_elsewhere_before_own_write_is_still_picked_up(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(datastore, 'FLUSH_DELAY', 3600)
+    data = open_data(tmp_path, backend)
+    data.commit([entry('Mop', 5)])
+    data.flush()
+    data.commit([entry('Broom', 3)])
+    # Another process appends directly
+    open_store(str(tmp_path / 'Inventory'), backend).append([entry('Duster', 2, stock=2)])
+    data.add_department('Arts')
+    data.flush()
+    assert sorted(data.snapshot().ledger['Item Name'].tolist()) == ['Broom', 'Duster', 'Mop']
+    assert 'Arts' in data.snapshot().departments
+    data.close()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_failed_log_rewrite_does_not_block_later_writes(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(datastore, 'FLUSH_DELAY', 3600)
+    data = open_data(tmp_path, backend)
+    rewrite = data.wal.write
+    failures = [OSError(28, 'No space left on device')]
+
+    def write_once_failing(batches):
+        if failures:
+            raise failures.pop()
+        rewrite(batches)
+
+    monkeypatch.setattr(data.wal, 'write', write_once_failing)
+    data.commit([entry('Mop', 5)])
+    with pytest.raises(OSError):
+        data.flush()
+    assert stored_items(tmp_path, backend) == ['Mop']
+    status = data.write_status()
+    assert status.pending_commits == 0 and isinstance(status.error, OSError)
+    # Writes that wait for the writer go through, and the next write clears the error
+    data.add_department('Arts')
+    data.commit([entry('Mop', 1, 'Arts')])
+    data.flush()
+    assert data.write_status().error is None
+    assert WriteAheadLog(str(tmp_path / 'Inventory')).read() == []
+    data.close()
+    assert stored_items(tmp_path, backend) == ['Mop', 'Mop']
+
+
+# The writer thread takes the second commit just before flush() would write it
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_flush_waits_for_a_batch_the_writer_took(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(datastore, 'FLUSH_DELAY', 0.01)
+    data = open_data(tmp_path, backend)
+    append, write_pending = data.store.append, data._write_pending
+
+    def slow_append(entries):
+        time.sleep(0.2)
+        append(entries)
+
+    def late_write_pending():
+        if threading.current_thread() is threading.main_thread():
+            time.sleep(0.1)
+        write_pending()
+
+    monkeypatch.setattr(data.store, 'append', slow_append)
+    monkeypatch.setattr(data, '_write_pending', late_write_pending)
+    data.commit([entry('Mop', 5)])
+    time.sleep(0.05)
+    data.commit([entry('Broom', 3)])
+    data.flush()
+    assert stored_items(tmp_path, backend) == ['Mop', 'Broom']
+    data.close()
+    assert not data._writer.is_alive()
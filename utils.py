@@ -1,64 +1,33 @@
-import streamlit as st
-import pandas as pd
-import os
+from inventory_service import STORE_NAME, InventoryService
+from metrics import timed
 
-# Define filename and sheet names
-FILE_NAME = 'Inventory.xlsx'
-LEDGER_SHEET = 'Ledger'
-OVERVIEW_SHEET = 'Overview'
+DEFAULT_DEPARTMENTS = ['Sports', 'Boys Hostel', 'Canteen', 'Girls Hostel', 'Personal']
 
-# Load the ledger from the Excel file
+# The inventory core (inventory_service.py); the store behind it is shared by every session in this process
+SERVICE = InventoryService(STORE_NAME, DEFAULT_DEPARTMENTS, item_types=['Asset', 'Consumable'])
+
+# Load the ledger (shared between sessions, do not modify in place)
 def load_ledger():
-    if os.path.exists(FILE_NAME):
-        try:
-            return pd.read_excel(FILE_NAME, sheet_name=LEDGER_SHEET, engine='openpyxl')
-        except ValueError:
-            return pd.DataFrame(columns=[
-                'Date', 'Type', 'Item Name', 'Department', 'Quantity Issued', 'Current Stock', 'Vendor Name', 'Invoice Number'
-            ])
-    else:
-        return pd.DataFrame(columns=[
-            'Date', 'Type', 'Item Name', 'Department', 'Quantity Issued', 'Current Stock', 'Vendor Name', 'Invoice Number'
-        ])
+    return SERVICE.ledger()
 
-# Load the overview (inventory) from the Excel file
-def load_overview():
-    if os.path.exists(FILE_NAME):
-        try:
-            return pd.read_excel(FILE_NAME, sheet_name=OVERVIEW_SHEET, engine='openpyxl')
-        except ValueError:
-            return pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + st.session_state.departments)
-    else:
-        return pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + st.session_state.departments)
+# Load the overview (inventory) rebuilt from the ledger, for the given
+# departments or every registered one, archived ones included
+def load_overview(departments=None):
+    return SERVICE.rebuild_overview(departments=departments)
 
-# Save the ledger to the Excel file
+# Replace the whole ledger in the store
 def save_ledger(ledger_df):
-    with pd.ExcelWriter(FILE_NAME, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        ledger_df.to_excel(writer, sheet_name=LEDGER_SHEET, index=False)
+    SERVICE.save_ledger(ledger_df)
+
+# Validate and append new entries to the ledger journal
+def append_ledger(entries, expected_version=None):
+    return SERVICE.commit(entries, expected_version)
 
-# Save the overview (inventory) to the Excel file
+# Save the overview (inventory) snapshot to the store
 def save_overview(overview_df):
-    with pd.ExcelWriter(FILE_NAME, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        overview_df.to_excel(writer, sheet_name=OVERVIEW_SHEET, index=False)
+    SERVICE.save_overview(overview_df)
 
 # Update inventory based on the ledger
-def update_inventory(ledger_df):
-    inventory = pd.DataFrame(columns=['Item Name', 'Type', 'Total', 'Admin'] + st.session_state.departments)
-    for index, row in ledger_df.iterrows():
-        if row['Item Name'] not in inventory['Item Name'].values:
-            new_row = {'Item Name': row['Item Name'], 'Type': row['Type'], 'Total': 0, 'Admin': 0}
-            for dept in st.session_state.departments:
-                new_row[dept] = 0
-            inventory = pd.concat([inventory, pd.DataFrame([new_row])], ignore_index=True)
-        
-        item_row = inventory[inventory['Item Name'] == row['Item Name']].index[0]
-        
-        if row['Department'] == 'Admin':
-            inventory.at[item_row, 'Admin'] += row['Quantity Issued']
-        elif row['Department'] in st.session_state.departments:
-            inventory.at[item_row, row['Department']] += row['Quantity Issued']
-            inventory.at[item_row, 'Admin'] -= row['Quantity Issued']
-        
-        inventory.at[item_row, 'Total'] = inventory.at[item_row, 'Admin'] + sum(inventory.loc[item_row, st.session_state.departments])
-    
-    return inventory
+@timed('update_inventory', rows=lambda result, ledger_df, departments=None: len(ledger_df))
+def update_inventory(ledger_df, departments=None):
+    return SERVICE.rebuild_overview(ledger_df, departments)